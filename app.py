@@ -3,34 +3,25 @@
 # -----------------------
 # -*- coding: utf-8 -*-
 import streamlit as st
-import pandas as pd
-import numpy as np
 import io
 import json
-import os
-from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
-from scipy.signal import find_peaks
-from sklearn.linear_model import LinearRegression
-from fpdf import FPDF
-
-# Users file (we'll use the users.json you provided)
-USER_FILE = "users.json"
-if not os.path.exists(USER_FILE):
-    # create a safe default to avoid crashes
-    with open(USER_FILE, "w") as f:
-        json.dump({
-            "admin": {"password": "admin", "role": "admin"},
-            "user": {"password": "user", "role": "user"},
-            "guest": {"password": "guest", "role": "user"}
-        }, f, indent=2)
-
-with open(USER_FILE, "r") as f:
-    users = json.load(f)
-
-def save_users(u):
-    with open(USER_FILE, "w") as f:
-        json.dump(u, f, indent=2)
+from datetime import datetime, timedelta
+# pandas, PIL drawing and FPDF are imported where used (linearity, S/N, PDF),
+# so the login page does not pay for them; see labt_importprof.py
+from labt_core import linear_fit, linear_fit_csv, linear_fit_multi_csv, locate_peak, peak_result, find_all_peaks, lod_loq, pixel_to_minutes, retention_text, time_zone, plot_window
+from labt_cache import content_hash, cached_image_and_trace, cached_signal, cached_calibration, source_image, AnnotatedImage, ANNOT_CACHE
+import labt_timing
+from labt_timing import span
+from labt_stages import Stages
+from labt_users import USER_FILE, user_access_from_record
+
+@st.cache_resource
+def get_user_store():
+    """One store per process: cached users.json, locked atomic writes, hashed passwords."""
+    from labt_users import UserStore
+    return UserStore(USER_FILE)
+
+user_store = get_user_store()
 
 # session defaults
 _defaults = {
@@ -40,8 +31,11 @@ _defaults = {
     "access": None,
     "lin_slope": None,
     "lin_intercept": None,
+    "lin_fit": None,
+    "lin_fits": {},
     "sn_result": {},
     "sn_img_annot": None,
+    "sn_peaks": None,
     "lang": "FR",
     "show_pass_change": False,
     # admin helper
@@ -104,37 +98,22 @@ TEXTS = {
 }
 
 # helpers
-def user_access_from_record(rec):
-    """Return access list given a user record (compatibility for role or explicit access)."""
-    if not isinstance(rec, dict):
-        return []
-    if rec.get("role") == "admin":
-        return ["admin"]
-    if "access" in rec:
-        return rec.get("access", [])
-    return ["linearity", "sn"]
-
-def calculate_lod_loq_from_noise(slope, noise):
-    lod_signal = 3.3 * noise
-    loq_signal = 10.0 * noise
-    if slope and slope != 0:
-        lod_conc = lod_signal / slope
-        loq_conc = loq_signal / slope
-    else:
-        lod_conc = None
-        loq_conc = None
-    return lod_signal, loq_signal, lod_conc, loq_conc
-
-def annotate_peak_on_image(img_pil, x_pixel, y_pixel, text):
-    draw = ImageDraw.Draw(img_pil)
-    r = 6
-    draw.ellipse((x_pixel-r, y_pixel-r, x_pixel+r, y_pixel+r), fill="red")
-    try:
-        font = ImageFont.load_default()
-        draw.text((x_pixel+8, max(0, y_pixel-12)), text, fill="red", font=font)
-    except Exception:
-        draw.text((x_pixel+8, max(0, y_pixel-12)), text, fill="red")
-    return img_pil
+# display width (px) above which images/traces are reduced before being sent to the browser
+PREVIEW_WIDTH = 1600
+
+def show_trace_chart(y, start, end, x=None, x_label="pixel"):
+    """Min/max-decimated plot of y[start:end+1], re-decimated on each zoom change."""
+    import pandas as pd
+    xs, ys = plot_window(y, start, end, n_out=PREVIEW_WIDTH, x=x)
+    st.line_chart(pd.DataFrame({x_label: xs, "signal": ys}), x=x_label, y="signal")
+
+def upload_hash(uploaded, data, key):
+    """Content hash of an upload, computed once per uploaded file id."""
+    fid = getattr(uploaded, "file_id", None) or uploaded.name
+    if st.session_state.get(f"{key}_hash_for") != fid:
+        st.session_state[f"{key}_hash"] = content_hash(data)
+        st.session_state[f"{key}_hash_for"] = fid
+    return st.session_state[f"{key}_hash"]
 
 # login page
 def login_page():
@@ -148,10 +127,10 @@ def login_page():
     password = st.text_input(texts["password"], type="password")
     if st.button(texts["login_btn"]):
         u = username.strip()
-        if u in users and users[u].get("password") == password:
+        rec = user_store.authenticate(u, password)
+        if rec is not None:
             st.session_state.logged_in = True
             st.session_state.user = u
-            rec = users[u]
             st.session_state.role = rec.get("role", "user")
             st.session_state.access = user_access_from_record(rec)
             st.rerun()
@@ -162,28 +141,76 @@ def login_page():
 # -----------------------
 # PART 2: Linéarité (CSV or manual inputs)
 # -----------------------
+def fmt(v, spec=".6g"):
+    # stored NaN statistics (e.g. s(res) of a 2-point fit) come back as None
+    return "N/A" if v is None else format(v, spec)
+
+def store_lin_fit(fit):
+    """Keep slope/intercept (used by S/N and PDF) and the fit statistics in session."""
+    st.session_state.lin_slope = fit["slope"]
+    st.session_state.lin_intercept = fit["intercept"]
+    st.session_state.lin_fit = {k: v for k, v in fit.items() if k != "residuals"}
+    st.session_state.lin_fits = {}
+    st.success(f"Slope: {fit['slope']:.6g}  Intercept: {fit['intercept']:.6g}  R²: {fit['r2']:.6f}")
+    st.write(f"n = {fit['n']} ; SE slope = {fmt(fit['se_slope'], '.4g')} ; SE intercept = {fmt(fit['se_intercept'], '.4g')} ; "
+             f"s(res) = {fmt(fit['s_res'], '.4g')}")
+
 def linearity_module():
+    import pandas as pd
+    from labt_store import lookup_lin, save_lin
     texts = TEXTS[st.session_state.lang]
     st.subheader(texts["linear_title"])
 
-    mode = st.selectbox("Mode Linéarité", ["CSV", "Saisie manuelle"], key="lin_mode")
-    if mode == "CSV":
+    mode = st.selectbox("Mode Linéarité", ["CSV", "CSV multi-analytes", "Saisie manuelle"], key="lin_mode")
+    if mode == "CSV multi-analytes":
+        uploaded = st.file_uploader("Upload CSV (concentration, signal analyte 1, analyte 2, ...)", type=["csv"], key="lin_csv_multi")
+        if uploaded:
+            try:
+                data = uploaded.getvalue()
+                data_hash = upload_hash(uploaded, data, "lin_csv_multi")
+                fits = {k: v for k, v in (lookup_lin(data_hash) or {}).items() if k}
+                preview = None
+                if not fits:
+                    with span("lin.fit_multi_csv"):
+                        fits, preview = linear_fit_multi_csv(io.BytesIO(data))
+                    # columns that could not be fitted are reported, not kept
+                    for name, fit in fits.items():
+                        if "error" in fit:
+                            st.warning(f"{name} : {fit['error']} (n = {fit['n']})")
+                    fits = {k: v for k, v in fits.items() if "error" not in v}
+                    save_lin(st.session_state.user, data_hash, fits)
+                st.session_state.lin_fits = fits
+                # first analyte stays the default slope for S/N and the PDF
+                first = next(iter(fits.values()))
+                st.session_state.lin_slope = first["slope"]
+                st.session_state.lin_intercept = first["intercept"]
+                st.session_state.lin_fit = first
+                st.success(f"{len(fits)} analytes ajustés")
+                st.dataframe(pd.DataFrame.from_dict(fits, orient="index"))
+                if preview is not None:
+                    st.dataframe(preview)
+                else:
+                    st.caption("Résultat repris de l'historique (même fichier).")
+            except Exception as e:
+                st.error(f"Erreur CSV: {e}")
+    elif mode == "CSV":
         uploaded = st.file_uploader("Upload CSV (concentration, signal)", type=["csv"], key="lin_csv")
         if uploaded:
             try:
-                df = pd.read_csv(uploaded)
-                if df.shape[1] < 2:
-                    st.error("Le CSV doit contenir au moins deux colonnes (concentration, signal).")
+                data = uploaded.getvalue()
+                data_hash = upload_hash(uploaded, data, "lin_csv")
+                fit = (lookup_lin(data_hash) or {}).get("")
+                preview = None
+                if fit is None:
+                    # streamed in chunks: constant memory whatever the file size
+                    with span("lin.fit_csv"):
+                        fit, preview = linear_fit_csv(io.BytesIO(data))
+                    save_lin(st.session_state.user, data_hash, {"": fit})
+                store_lin_fit(fit)
+                if preview is not None:
+                    st.dataframe(preview)
                 else:
-                    x = df.iloc[:,0].astype(float).values.reshape(-1,1)
-                    y = df.iloc[:,1].astype(float).values
-                    reg = LinearRegression().fit(x,y)
-                    slope = float(reg.coef_[0])
-                    intercept = float(reg.intercept_)
-                    st.session_state.lin_slope = slope
-                    st.session_state.lin_intercept = intercept
-                    st.success(f"Slope: {slope:.6g}  Intercept: {intercept:.6g}")
-                    st.dataframe(df)
+                    st.caption("Résultat repris de l'historique (même fichier).")
             except Exception as e:
                 st.error(f"Erreur CSV: {e}")
     else:
@@ -196,114 +223,429 @@ def linearity_module():
                 if len(concs) != len(sigs) or len(concs) < 2:
                     st.error("Nombres invalides ou insuffisants")
                 else:
-                    x = np.array(concs).reshape(-1,1)
-                    y = np.array(sigs)
-                    reg = LinearRegression().fit(x,y)
-                    slope = float(reg.coef_[0])
-                    intercept = float(reg.intercept_)
-                    st.session_state.lin_slope = slope
-                    st.session_state.lin_intercept = intercept
-                    st.success(f"Slope: {slope:.6g}  Intercept: {intercept:.6g}")
-                    st.dataframe(pd.DataFrame({"concentration": concs, "signal": sigs}))
+                    with span("lin.fit_manual"):
+                        fit = linear_fit(concs, sigs)
+                    save_lin(st.session_state.user, content_hash(repr((concs, sigs)).encode()), {"": fit})
+                    store_lin_fit(fit)
+                    st.dataframe(pd.DataFrame({"concentration": concs, "signal": sigs, "residual": fit["residuals"]}))
             except Exception as e:
                 st.error("Erreur saisie manuelle")
 # -----------------------
-# PART 3: S/N module (image analysis + manual S/N)
+# PART 3: S/N module (image or raw signal analysis + manual S/N)
 # -----------------------
-def sn_module():
-    texts = TEXTS[st.session_state.lang]
-    st.subheader(texts["sn_title"])
+def stored_peak(content_hash_, zone_params):
+    """Main peak from the result store for this content and zone, or None."""
+    from labt_store import lookup_sn
+    row = lookup_sn(content_hash_, zone_params)
+    if row is None or row["idx_global"] is None:
+        return None
+    return {"idx_global": row["idx_global"], "signal": row["signal"], "noise": row["noise"], "sn": row["sn"]}
+
+def sn_stages():
+    """Per-session S/N pipeline stages (see labt_stages): a rerun only recomputes what its edits touch."""
+    if "sn_stages" not in st.session_state:
+        st.session_state.sn_stages = Stages()
+    return st.session_state.sn_stages
+
+def stored_zone(content_hash_, trace_params):
+    """(start, end, width) of the user's latest stored result for this content and
+    trace options (any zone or noise method), or None: lets a stored image skip
+    decoding. Other users' zones never replace the detected plot area."""
+    from labt_store import history
+    for row in history("sn", user=st.session_state.user, image_hash=content_hash_, limit=50):
+        p = json.loads(row["params_key"])
+        if "start" in p and row["width"] and all(p.get(k) == v for k, v in trace_params.items()):
+            return p["start"], p["end"], row["width"]
+    return None
+
+def staged_peak(stages, prefix, content_hash_, zone_params, load_trace, trace_tok, start, end, opts):
+    """Main peak as stages: stored result, else peak search then noise.
+
+    load_trace() is only called when nothing is stored. The peak search depends
+    on the trace and zone only, so changing the noise method keeps the located
+    apex; time scale or unit edits touch neither.
+    """
+    stored, _ = stages.run(f"{prefix}.stored", lambda: stored_peak(content_hash_, zone_params),
+                           content_hash_, sorted(zone_params.items()))
+    if stored is not None:
+        return stored
+    found, tok = stages.run(f"{prefix}.peak", lambda: locate_peak(load_trace(), start, end, opts["baseline"]),
+                            trace_tok, start, end, opts["baseline"])
+    peak, _ = stages.run(f"{prefix}.noise",
+                         lambda: None if found is None else peak_result(load_trace(), found[0], start, found[1],
+                                                                        opts["noise"], opts["blank"], opts["baseline"]),
+                         tok, opts["noise"], opts["blank"])
+    return peak
+
+def stored_slope():
+    """Slope of the analyte picked in sn_module(), else the last linearity slope."""
+    fits = st.session_state.get("lin_fits") or {}
+    analyte = st.session_state.get("sn_analyte")
+    if analyte in fits:
+        return fits[analyte]["slope"]
+    return st.session_state.lin_slope
+
+def show_sn_result(H, noise, sn_value, rt_text, unit, manual_slope, store_key=None, extra=None, noise_method="std"):
+    """Compute LOD/LOQ with the chosen slope, store sn_result and display it.
+
+    noise_method="p2p" means noise is h/2 (Ph. Eur. peak-to-peak), labelled as such.
+
+    store_key = (content hash, zone params, source) adds a button that saves
+    the result to the SQLite history.
+    """
+    # choose slope (manual override or stored)
+    try:
+        slope_use = float(manual_slope) if (manual_slope is not None and manual_slope.strip() != "") else stored_slope()
+    except:
+        slope_use = None
+
+    lod_s, loq_s, lod_c, loq_c = lod_loq(noise, slope_use)
+
+    st.session_state.sn_result = {
+        "signal": H,
+        "noise": noise,
+        "sn": sn_value,
+        "lod_s": lod_s,
+        "loq_s": loq_s,
+        "lod_c": lod_c,
+        "loq_c": loq_c,
+        "rt_text": rt_text,
+        "unit": unit,
+        "noise_method": noise_method,
+        "analyte": st.session_state.get("sn_analyte") if st.session_state.get("lin_fits") else None
+    }
 
-    unit = st.selectbox(TEXTS[st.session_state.lang]["unit_label"], ["µg/mL","mg/mL","ng/mL"], index=0, key="sn_unit")
-    manual_slope = st.text_input(TEXTS[st.session_state.lang]["enter_slope_manual"], placeholder="laisser vide si non", key="manual_slope")
+    st.write(f"H (signal) = {H:.6g}")
+    if noise_method == "p2p":
+        st.write(f"h/2 (bruit pic-à-pic / 2) = {noise:.6g} ; h = {2 * noise:.6g}")
+    else:
+        st.write(f"h (noise) = {noise:.6g}")
+    if sn_value is not None:
+        st.write(f"S/N = {sn_value:.3f}")
+    else:
+        st.write("S/N indéterminé (bruit nul)")
+    if lod_s is not None:
+        st.write(f"LOD signal = {lod_s:.6g} ; LOQ signal = {loq_s:.6g}")
+    if lod_c is not None:
+        st.write(f"LOD concentration = {lod_c:.6g} {unit} ; LOQ concentration = {loq_c:.6g} {unit}")
+    if store_key is not None and st.button("Enregistrer dans l'historique", key="sn_save"):
+        from labt_store import save_sn
+        save_sn(st.session_state.user, store_key[0], store_key[1], dict(st.session_state.sn_result, **(extra or {})),
+                analyte=st.session_state.sn_result["analyte"], source=store_key[2])
+        st.success("Résultat enregistré")
+
+def noise_options(key, unit_label="pixel"):
+    """Baseline/noise method widgets; returns find_main_peak keyword arguments."""
+    with st.expander("Ligne de base et bruit"):
+        col1, col2 = st.columns(2)
+        with col1:
+            baseline = st.selectbox("Ligne de base", [None, "als", "quantile"], key=f"{key}_baseline",
+                                    format_func=lambda m: {None: "Aucune", "als": "Moindres carrés asymétriques (ALS)",
+                                                           "quantile": "Quantile glissant"}[m])
+        with col2:
+            noise = st.selectbox("Bruit h", ["std", "mad", "p2p"], key=f"{key}_noise",
+                                 format_func=lambda m: {"std": "Écart-type de la zone", "mad": "MAD (robuste)",
+                                                        "p2p": "Pic-à-pic (Ph. Eur., S/N = 2H/h)"}[m])
+        blank = None
+        if noise == "p2p":
+            col1, col2 = st.columns(2)
+            with col1:
+                b0 = st.number_input(f"Fenêtre blanc : début ({unit_label})", value=0.0, key=f"{key}_blank0")
+            with col2:
+                b1 = st.number_input(f"Fenêtre blanc : fin ({unit_label}, 0 = auto 20 à 5 x FWHM)", value=0.0, key=f"{key}_blank1")
+            if b1 > b0:
+                blank = (b0, b1)
+    return {"baseline": baseline, "noise": noise, "blank": blank}
 
+def sn_from_image(unit, manual_slope):
+    import pandas as pd
     st.markdown("**S/N depuis image**")
     uploaded_img = st.file_uploader("Upload chromatogram image (png/jpg/tif)", type=["png","jpg","jpeg","tif"], key="sn_img")
     if uploaded_img:
         try:
-            img = Image.open(uploaded_img).convert("RGB")
-            img_gray = img.convert("L")
-            arr = np.array(img_gray)
-            trace = arr.max(axis=0).astype(float)
-            width = trace.shape[0]
-
+            # decoded image + trace are cached by content hash across reruns/sessions
+            data = uploaded_img.getvalue()
+            stages = sn_stages()
             col1, col2 = st.columns(2)
             with col1:
-                start = st.number_input("Start pixel", 0, width-1, 0, key="sn_start")
+                method = st.radio("Extraction de la trace", ["curve", "max"], horizontal=True, key="sn_trace_method",
+                                  format_func=lambda m: {"curve": "Courbe (zone auto)", "max": "Intensité max (colonne)"}[m])
             with col2:
-                end = st.number_input("End pixel", 0, width-1, width-1, key="sn_end")
+                crop = st.text_input("Recadrage avant analyse (gauche,haut,droite,bas ; vide = image entière)", key="sn_crop")
+            box = tuple(int(v) for v in crop.split(",")) if crop.strip() else None
+            img_hash = upload_hash(uploaded_img, data, "sn_img")
+
+            def decoded():
+                with span("sn.load"):
+                    return cached_image_and_trace(data, img_hash, method, box)
+
+            # zone defaults to the detected plot area (axes/labels excluded), per image/options
+            zone_key = f"{img_hash[:8]}_{method}_{box}"
+
+            # axis calibration from the tick labels (OCR once per image, then cached/stored)
+            from labt_ocr import ocr_available, to_intensity
+            cal = None
+            if st.checkbox("Calibrer les axes par OCR (graduations)", value=ocr_available(), disabled=not ocr_available(),
+                           key="sn_ocr", help=None if ocr_available() else "tesseract non disponible"):
+                with span("sn.ocr"):
+                    cal = cached_calibration(img_hash, lambda: decoded()[1], box)
+            st.session_state.setdefault("sn_t0", 0.0)
+            st.session_state.setdefault("sn_t1", 0.0)
+            if cal and cal["time"] and st.session_state.get("sn_cal_for") != zone_key:
+                st.session_state.sn_t0 = cal["t0"]
+                st.session_state.sn_t1 = cal["t1"]
+                st.session_state.sn_cal_for = zone_key
+            calibrated = bool(cal and cal["intensity"] and method == "curve")
+            # a stored result gives the zone and width: the image is decoded only when needed
+            def default_zone():
+                zone = stored_zone(img_hash, {"trace": method, "calibrated": calibrated, "box": list(box) if box else None})
+                if zone is None:
+                    _, _, raw, (x0, x1) = decoded()
+                    zone = (x0, x1, raw.shape[0])
+                return zone
+            (x0, x1, width), _ = stages.run("sn.zone", default_zone, img_hash, method, box, calibrated)
+            load_trace, trace_tok = stages.lazy(
+                "sn.trace", lambda: to_intensity(decoded()[2], cal) if calibrated else decoded()[2],
+                img_hash, method, box, calibrated)
+            if cal:
+                st.caption(f"OCR: temps {'calibré' if cal['time'] else 'non lu'} "
+                           f"({(cal['time'] or {}).get('n', 0)} graduations), intensité "
+                           f"{'calibrée' if calibrated else 'en pixels'} ({(cal['intensity'] or {}).get('n', 0)} graduations)")
+            col1, col2 = st.columns(2)
+            with col1:
+                start = st.number_input("Start pixel", 0, width-1, x0, key=f"sn_start_{zone_key}")
+            with col2:
+                end = st.number_input("End pixel", 0, width-1, x1, key=f"sn_end_{zone_key}")
             if start >= end:
                 st.warning("Start doit être < End")
             else:
-                zone = trace[start:end+1]
-                peaks, _ = find_peaks(zone)
-                if len(peaks) == 0:
+                if st.checkbox("Afficher la trace de la zone", key="sn_show_trace"):
+                    show_trace_chart(load_trace(), start, end)
+                # same content + zone already analyzed (any session): reuse the stored peak
+                opts = noise_options("sn_img")
+                if opts["blank"]:
+                    opts["blank"] = tuple(int(v) for v in opts["blank"])
+                zone_params = {"start": int(start), "end": int(end), "trace": method, "calibrated": calibrated, **opts}
+                if box:
+                    zone_params["box"] = list(box)
+                peak = staged_peak(stages, "sn", img_hash, zone_params, load_trace, trace_tok, int(start), int(end), opts)
+                if peak is None:
                     st.info("Aucun pic détecté dans la zone. Ajuster la zone.")
                 else:
-                    idx_rel = peaks[np.argmax(zone[peaks])]
-                    idx_global = start + int(idx_rel)
-                    H = float(zone[int(idx_rel)])
-                    left = max(0, int(idx_rel) - 3)
-                    right = min(len(zone) - 1, int(idx_rel) + 3)
-                    baseline = np.concatenate([zone[:left], zone[right+1:]]) if (left > 0 or right < len(zone)-1) else np.array([])
-                    noise = float(np.std(baseline)) if baseline.size > 0 else float(np.std(zone))
-                    sn_value = H / noise if noise > 0 else None
+                    idx_global = peak["idx_global"]
+                    H = peak["signal"]
+                    noise = peak["noise"]
+                    sn_value = peak["sn"]
 
                     # optional time mapping
                     st.markdown("**Échelle temporelle (optionnel)**")
-                    t0 = st.number_input("Image start time (minutes)", value=0.0, format="%.6f", key="sn_t0")
-                    t1 = st.number_input("Image end time (minutes)", value=0.0, format="%.6f", key="sn_t1")
-                    if (t1 > t0) and (width > 1):
-                        rt_minutes = t0 + (idx_global / (width - 1)) * (t1 - t0)
-                        rt_text = f"{rt_minutes:.3f} min"
+                    t0 = st.number_input("Image start time (minutes)", format="%.6f", key="sn_t0")
+                    t1 = st.number_input("Image end time (minutes)", format="%.6f", key="sn_t1")
+                    rt_text = retention_text(idx_global, width, t0, t1)
+
+                    # annotated image as a recipe: reduced preview now, full size only for the PDF;
+                    # the source is reloaded by content hash, the session never keeps the upload
+                    def annotate():
+                        return AnnotatedImage((img_hash, method, box, idx_global, rt_text),
+                                              lambda: source_image(img_hash, method, box), idx_global, rt_text)
+                    annot, _ = stages.run("sn.annotate", annotate, img_hash, method, box, idx_global, rt_text)
+                    # every rerun while the upload is here: re-create the spill file if it was pruned
+                    from labt_pages import spill_upload
+                    spill_upload(data, img_hash, ".img")
+                    st.image(annot.preview(PREVIEW_WIDTH), caption="Image annotée (pic en rouge)")
+                    st.session_state.sn_img_annot = annot
+
+                    show_sn_result(H, noise, sn_value, rt_text, unit, manual_slope,
+                                   store_key=(img_hash, zone_params, "image"),
+                                   extra={"idx_global": idx_global, "width": width}, noise_method=opts["noise"])
+
+                # all peaks of the zone (one vectorized pass)
+                if st.checkbox("Tous les pics de la zone (multi-pics)", key="sn_multi"):
+                    min_prom = st.number_input("Prominence minimale (0 = auto)", min_value=0.0, value=0.0, key="sn_min_prom")
+                    peaks_tab, _ = stages.run("sn.multi_peaks",
+                                              lambda: find_all_peaks(load_trace(), int(start), int(end),
+                                                                     min_prominence=(min_prom or None)),
+                                              trace_tok, int(start), int(end), min_prom)
+                    if len(peaks_tab["idx_global"]) == 0:
+                        st.info("Aucun pic détecté dans la zone. Ajuster la zone.")
                     else:
-                        rt_text = f"{idx_global} px"
-
-                    # annotate and show
-                    img_annot = img.copy()
-                    annotate_peak_on_image(img_annot, idx_global, 10, rt_text)
-                    st.image(img_annot, caption="Image annotée (pic en rouge)")
-                    st.session_state.sn_img_annot = img_annot
-
-                    # choose slope (manual override or stored)
-                    try:
-                        slope_use = float(manual_slope) if (manual_slope is not None and manual_slope.strip() != "") else st.session_state.lin_slope
-                    except:
-                        slope_use = None
-
-                    lod_s = loq_s = lod_c = loq_c = None
-                    if noise is not None:
-                        if slope_use is not None:
-                            lod_s, loq_s, lod_c, loq_c = calculate_lod_loq_from_noise(slope_use, noise)
-                        else:
-                            lod_s, loq_s = 3.3*noise, 10*noise
-                            lod_c, loq_c = None, None
-
-                    st.session_state.sn_result = {
-                        "signal": H,
-                        "noise": noise,
-                        "sn": sn_value,
-                        "lod_s": lod_s,
-                        "loq_s": loq_s,
-                        "lod_c": lod_c,
-                        "loq_c": loq_c,
-                        "rt_text": rt_text,
-                        "unit": unit
-                    }
-
-                    st.write(f"H (signal) = {H:.6g}")
-                    st.write(f"h (noise) = {noise:.6g}")
-                    if sn_value is not None:
-                        st.write(f"S/N = {sn_value:.3f}")
-                    else:
-                        st.write("S/N indéterminé (bruit nul)")
-                    if lod_s is not None:
-                        st.write(f"LOD signal = {lod_s:.6g} ; LOQ signal = {loq_s:.6g}")
-                    if lod_c is not None:
-                        st.write(f"LOD concentration = {lod_c:.6g} {unit} ; LOQ concentration = {loq_c:.6g} {unit}")
+                        df_peaks = pd.DataFrame(peaks_tab)
+                        rt = pixel_to_minutes(peaks_tab["idx_global"], width,
+                                              st.session_state.get("sn_t0", 0.0), st.session_state.get("sn_t1", 0.0))
+                        if rt is not None:
+                            df_peaks.insert(1, "rt_min", rt)
+                        st.dataframe(df_peaks)
+                        st.session_state.sn_peaks = df_peaks.to_dict(orient="list")
         except Exception as e:
             st.error(f"Erreur lors du traitement de l'image: {e}")
 
+def sn_from_signal(unit, manual_slope):
+    import pandas as pd
+    st.markdown("**S/N depuis signal brut**")
+    uploaded_sig = st.file_uploader("Upload raw signal (ANDI/AIA .cdf or CSV time,intensity)", type=["cdf","nc","csv","txt"], key="sn_sig")
+    if uploaded_sig:
+        try:
+            data = uploaded_sig.getvalue()
+            with span("sn.load"):
+                sig_hash, time, intensity = cached_signal(data, uploaded_sig.name, upload_hash(uploaded_sig, data, "sn_sig"))
+            if time.size < 3:
+                st.error("Signal trop court.")
+                return
+            st.caption(f"{time.size} points, {time[0]:.3f} – {time[-1]:.3f} min")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                t_start = st.number_input("Start (min)", value=float(time[0]), format="%.4f", key="sn_sig_start")
+            with col2:
+                t_end = st.number_input("End (min)", value=float(time[-1]), format="%.4f", key="sn_sig_end")
+            start, end = time_zone(time, t_start, t_end)
+            if start >= end:
+                st.warning("Start doit être < End")
+                return
+            if st.checkbox("Afficher la trace de la zone", key="sn_sig_show_trace"):
+                show_trace_chart(intensity, start, end, x=time, x_label="min")
+            opts = noise_options("sn_sig", "min")
+            if opts["blank"]:
+                opts["blank"] = time_zone(time, *opts["blank"])
+            zone_params = {"start": start, "end": end, **opts}
+            stages = sn_stages()
+            peak = staged_peak(stages, "sig", sig_hash, zone_params, lambda: intensity, sig_hash, start, end, opts)
+            if peak is None:
+                st.info("Aucun pic détecté dans la zone. Ajuster la zone.")
+            else:
+                rt_text = f"{float(time[peak['idx_global']]):.3f} min"
+                show_sn_result(peak["signal"], peak["noise"], peak["sn"], rt_text, unit, manual_slope,
+                               store_key=(sig_hash, zone_params, "signal"),
+                               extra={"idx_global": peak["idx_global"], "width": len(intensity)},
+                               noise_method=opts["noise"])
+
+            if st.checkbox("Tous les pics de la zone (multi-pics)", key="sn_sig_multi"):
+                min_prom = st.number_input("Prominence minimale (0 = auto)", min_value=0.0, value=0.0, key="sn_sig_min_prom")
+                peaks_tab, _ = stages.run("sig.multi_peaks",
+                                          lambda: find_all_peaks(intensity, start, end, min_prominence=(min_prom or None)),
+                                          sig_hash, start, end, min_prom)
+                if len(peaks_tab["idx_global"]) == 0:
+                    st.info("Aucun pic détecté dans la zone. Ajuster la zone.")
+                else:
+                    df_peaks = pd.DataFrame(peaks_tab)
+                    df_peaks.insert(1, "rt_min", time[peaks_tab["idx_global"].astype(int)])
+                    st.dataframe(df_peaks)
+                    st.session_state.sn_peaks = df_peaks.to_dict(orient="list")
+        except Exception as e:
+            st.error(f"Erreur lors de la lecture du signal: {e}")
+
+def sn_from_pdf(unit, manual_slope):
+    import pandas as pd
+    from PIL import Image
+    from labt_ocr import ocr_available
+    from labt_pages import PDF_DPI, page_count, iter_pages, spill_upload, discard_spill, render_page, preview_png
+    from labt_store import save_sn
+    st.markdown("**S/N depuis rapport PDF (un chromatogramme par page)**")
+    uploaded_pdf = st.file_uploader("Upload PDF report", type=["pdf"], key="sn_pdf")
+    if not uploaded_pdf:
+        return
+    try:
+        data = uploaded_pdf.getvalue()
+        pdf_hash = upload_hash(uploaded_pdf, data, "sn_pdf")
+        path = spill_upload(data, pdf_hash)
+        try:
+            n_pages = page_count(path)
+        except Exception:
+            discard_spill(path)   # not a readable PDF: do not keep it on disk
+            raise
+        col1, col2 = st.columns(2)
+        with col1:
+            dpi = int(st.number_input("Résolution de rendu (DPI)", 50, 600, PDF_DPI, step=25, key="sn_pdf_dpi"))
+        with col2:
+            ocr = st.checkbox("Calibrer les axes par OCR (graduations)", value=ocr_available(),
+                              disabled=not ocr_available(), key="sn_pdf_ocr")
+        col1, col2 = st.columns(2)
+        with col1:
+            method = st.radio("Extraction de la trace", ["curve", "max"], horizontal=True, key="sn_pdf_trace_method",
+                              format_func=lambda m: {"curve": "Courbe (zone auto)", "max": "Intensité max (colonne)"}[m])
+        with col2:
+            crop = st.text_input("Zone du graphique sur la page (gauche,haut,droite,bas en pixels au DPI choisi ; "
+                                 "vide = détection des axes)", key="sn_pdf_crop")
+        opts = noise_options("sn_pdf")
+        if opts["blank"]:
+            opts["blank"] = tuple(int(v) for v in opts["blank"])
+        # pixel positions (start/end, blank, apex) are relative to the chart box of each page
+        page_params = {"trace": method, **opts}
+        if crop.strip():
+            page_params["box"] = [int(v) for v in crop.split(",")]
+        st.caption(f"{n_pages} pages")
+
+        def page_table(rows):
+            cols = ["page", "signal", "noise", "sn", "rt_text", "idx_global", "box", "seconds", "error"]
+            return pd.DataFrame([{k: r.get(k) for k in cols} for _, r in sorted(rows.items())])
+
+        job_key = (pdf_hash, dpi, ocr, repr(sorted(page_params.items())))
+        rows = st.session_state.get("sn_pdf_rows") if st.session_state.get("sn_pdf_for") == job_key else None
+        if rows is None:
+            if not st.button(f"Analyser les {n_pages} pages", key="sn_pdf_run"):
+                return
+            # pages are rendered and analyzed in worker processes; rows appear as pages finish
+            rows = {}
+            bar = st.progress(0.0)
+            table = st.empty()
+            for row in iter_pages(path, dpi, {"calibrate": ocr, **page_params}):
+                # page previews go to the shared image budget, not to the session
+                if "preview" in row:
+                    ANNOT_CACHE.put((pdf_hash, dpi, row["page"], tuple(row["box"])), row.pop("preview"))
+                rows[row["page"]] = row
+                if not row.get("error"):
+                    save_sn(st.session_state.user, pdf_hash, {"page": row["page"], "dpi": dpi, "calibrated": ocr, **page_params},
+                            row, source="pdf")
+                bar.progress(len(rows) / n_pages, text=f"{len(rows)}/{n_pages} pages")
+                table.dataframe(page_table(rows))
+            st.session_state.sn_pdf_rows = rows
+            st.session_state.sn_pdf_for = job_key
+        else:
+            st.dataframe(page_table(rows))
+
+        ok_pages = [p for p, r in sorted(rows.items()) if not r.get("error")]
+        if not ok_pages:
+            st.info("Aucun pic détecté sur les pages du rapport.")
+            return
+        page = st.selectbox("Page retenue pour le résultat et le rapport", ok_pages, key="sn_pdf_page")
+        r = rows[page]
+        box = tuple(r["box"])
+
+        def load_chart():
+            return render_page(path, page - 1, dpi).crop(box)
+
+        def load_preview():
+            data = ANNOT_CACHE.get((pdf_hash, dpi, page, box))
+            if data is None:
+                data = ANNOT_CACHE.put((pdf_hash, dpi, page, box), preview_png(load_chart())[0])
+            return Image.open(io.BytesIO(data)).convert("RGB"), r["preview_factor"]
+        annot = AnnotatedImage((pdf_hash, dpi, page, box, r["idx_global"], r["rt_text"]),
+                               load_chart, r["idx_global"], r["rt_text"], load_preview)
+        st.image(annot.preview(), caption=f"Page {page} annotée (pic en rouge)")
+        st.session_state.sn_img_annot = annot
+        show_sn_result(r["signal"], r["noise"], r["sn"], r["rt_text"], unit, manual_slope,
+                       store_key=(pdf_hash, {"page": page, "dpi": dpi, "calibrated": ocr, **page_params}, "pdf"),
+                       extra={"idx_global": r["idx_global"], "width": r["width"]}, noise_method=opts["noise"])
+    except Exception as e:
+        st.error(f"Erreur lors du traitement du PDF: {e}")
+
+def sn_module():
+    texts = TEXTS[st.session_state.lang]
+    st.subheader(texts["sn_title"])
+
+    unit = st.selectbox(TEXTS[st.session_state.lang]["unit_label"], ["µg/mL","mg/mL","ng/mL"], index=0, key="sn_unit")
+    manual_slope = st.text_input(TEXTS[st.session_state.lang]["enter_slope_manual"], placeholder="laisser vide si non", key="manual_slope")
+    if st.session_state.get("lin_fits"):
+        st.selectbox("Analyte (pente de linéarité)", list(st.session_state.lin_fits.keys()), key="sn_analyte")
+
+    source = st.radio("Source", ["Image", "Rapport PDF (multi-pages)", "Signal brut (CSV / CDF)"], horizontal=True, key="sn_source")
+    if source == "Image":
+        sn_from_image(unit, manual_slope)
+    elif source == "Rapport PDF (multi-pages)":
+        sn_from_pdf(unit, manual_slope)
+    else:
+        sn_from_signal(unit, manual_slope)
+
     # --- Manual S/N (button-driven) ---
     st.markdown("---")
     st.subheader("Calcul manuel S/N")
@@ -313,7 +655,7 @@ def sn_module():
         if h_in > 0:
             sn_manual = float(H_in) / float(h_in)
             try:
-                slope_use2 = float(manual_slope) if (manual_slope is not None and manual_slope.strip() != "") else st.session_state.lin_slope
+                slope_use2 = float(manual_slope) if (manual_slope is not None and manual_slope.strip() != "") else stored_slope()
             except:
                 slope_use2 = None
             lod_s_man = 3.3 * h_in
@@ -330,61 +672,74 @@ def sn_module():
 # PART 4: PDF generation, admin panel, main_app, run
 # -----------------------
 def generate_pdf():
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, "LabT Report", ln=True, align="C")
-
-    # Linearity section
-    pdf.set_font("Arial", "", 12)
-    slope = st.session_state.lin_slope
-    intercept = st.session_state.lin_intercept
-    if slope is not None:
-        pdf.cell(0, 8, f"Slope: {slope:.6g}   Intercept: {intercept:.6g}", ln=True)
-    else:
-        pdf.cell(0, 8, "Slope: N/A", ln=True)
-
-    # S/N results
-    snr = st.session_state.sn_result
-    if snr:
-        pdf.cell(0, 8, f"S/N: {snr.get('sn','N/A')}", ln=True)
-        pdf.cell(0, 8, f"Signal H: {snr.get('signal','N/A')}", ln=True)
-        pdf.cell(0, 8, f"Noise h: {snr.get('noise','N/A')}", ln=True)
-        if snr.get("lod_s") is not None:
-            pdf.cell(0, 8, f"LOD signal: {snr.get('lod_s'):.6g}", ln=True)
-            pdf.cell(0, 8, f"LOQ signal: {snr.get('loq_s'):.6g}", ln=True)
-        if snr.get("lod_c") is not None:
-            pdf.cell(0, 8, f"LOD conc: {snr.get('lod_c'):.6g} {snr.get('unit')}", ln=True)
-            pdf.cell(0, 8, f"LOQ conc: {snr.get('loq_c'):.6g} {snr.get('unit')}", ln=True)
-        if snr.get("rt_text"):
-            pdf.cell(0, 8, f"Retention: {snr.get('rt_text')}", ln=True)
-
-    # annotated image
-    if st.session_state.sn_img_annot is not None:
-        buf = io.BytesIO()
-        try:
-            st.session_state.sn_img_annot.save(buf, format="PNG")
-            buf.seek(0)
-            try:
-                pdf.image(buf, x=10, w=180)
-            except Exception:
-                tmpname = f"tmp_img_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                with open(tmpname, "wb") as f:
-                    f.write(buf.getbuffer())
-                pdf.image(tmpname, x=10, w=180)
-                os.remove(tmpname)
-        except Exception:
-            pass
-
-    out_bytes = pdf.output(dest="S").encode("latin1")
+    """Queue the session report in the report worker pool (see pdf_job_panel)."""
+    from labt_report import build_report, submit
+    # an AnnotatedImage is rendered at full size in the report worker, not here
+    annot = st.session_state.sn_img_annot
+    future = submit(build_report, st.session_state.lin_slope, st.session_state.lin_intercept,
+                    dict(st.session_state.get("lin_fits") or {}), dict(st.session_state.sn_result or {}),
+                    annot.full if isinstance(annot, AnnotatedImage) else annot)
+    st.session_state.pdf_job = {"future": future,
+                                "file_name": f"LabT_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"}
+
+def pdf_job_panel():
+    """Download button of the last queued report, polled without blocking the page."""
+    job = st.session_state.get("pdf_job")
+    if job is None:
+        return
+    if not job["future"].done():
+        _pdf_job_wait()
+        return
+    try:
+        out_bytes, secs = job["future"].result()
+    except Exception as e:
+        st.error(f"Erreur PDF: {e}")
+        return
     st.download_button(TEXTS[st.session_state.lang]["download_pdf"], data=out_bytes,
-                       file_name=f"LabT_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                       mime="application/pdf")
+                       file_name=job["file_name"], mime="application/pdf", key="pdf_job_download")
+    st.caption(f"PDF généré en {secs:.2f} s")
+
+@st.fragment(run_every=0.5)
+def _pdf_job_wait():
+    job = st.session_state.get("pdf_job")
+    if job is not None and job["future"].done():
+        st.rerun()
+    st.info("Génération du PDF en cours…")
+
+# Stored results (SQLite history)
+def history_panel(user=None):
+    """History of stored analyses; user=None lets the admin filter on any user."""
+    import pandas as pd
+    from labt_store import history
+    with st.expander("Historique des analyses"):
+        kind = st.radio("Type", ["S/N", "Linéarité"], horizontal=True, key="hist_kind")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            analyte = st.text_input("Analyte", key="hist_analyte")
+        with col2:
+            d_from = st.date_input("Du", value=None, key="hist_from")
+        with col3:
+            d_to = st.date_input("Au", value=None, key="hist_to")
+        who = user if user is not None else (st.text_input("Utilisateur", key="hist_user").strip() or None)
+        rows = history("sn" if kind == "S/N" else "lin", user=who, analyte=analyte.strip() or None,
+                       date_from=d_from, date_to=(d_to + timedelta(days=1)) if d_to else None)
+        if rows:
+            st.dataframe(pd.DataFrame(rows))
+        else:
+            st.info("Aucun résultat enregistré.")
+        if st.button("Rapport PDF combiné (S/N + linéarité, mêmes filtres)", key="hist_pdf"):
+            from labt_report import build_batch_report, submit
+            filters = dict(user=who, analyte=analyte.strip() or None, date_from=d_from,
+                           date_to=(d_to + timedelta(days=1)) if d_to else None, limit=10000)
+            future = submit(build_batch_report, history("sn", **filters), history("lin", **filters))
+            st.session_state.pdf_job = {"future": future,
+                                        "file_name": f"LabT_Batch_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"}
 
 # Admin panel (no JSON table shown)
 def admin_panel():
     texts = TEXTS[st.session_state.lang]
     st.subheader(texts["admin_users"])
+    users = user_store.all()
 
     user_list = sorted(list(users.keys()))
     selected_user = st.selectbox(texts["select_user"], user_list, key="admin_selected_user")
@@ -401,8 +756,7 @@ def admin_panel():
         newpw = st.text_input(f"Nouveau mot de passe pour {selected_user}", type="password", key="admin_newpw")
         if st.button("Enregistrer mot de passe", key="admin_savepw"):
             if newpw:
-                users[selected_user]["password"] = newpw
-                save_users(users)
+                user_store.set_password(selected_user, newpw)
                 st.success(f"Mot de passe de {selected_user} mis à jour.")
                 del st.session_state["admin_change_pw_for"]
             else:
@@ -415,32 +769,57 @@ def admin_panel():
         if st.button("Ajouter", key="admin_add_btn"):
             if not new_user:
                 st.error("Nom utilisateur requis.")
-            elif new_user in users:
+            elif not new_pass:
+                st.error("Mot de passe vide.")
+            elif not user_store.add_user(new_user, new_pass, []):
                 st.error("Utilisateur existe déjà.")
             else:
-                users[new_user] = {"password": new_pass, "access": []}
-                save_users(users)
                 st.success(f"Utilisateur {new_user} ajouté.")
-                st.experimental_rerun()
+                st.rerun()
 
     # Privileges multiselect (safe default values)
     all_privs = ["linearity", "sn"]
-    raw_current = users[selected_user].get("access", [])
+    raw_current = rec.get("access", [])
     current_privs = [p for p in raw_current if p in all_privs]
     new_privs = st.multiselect("Modifier privilèges (cocher pour donner accès)", options=all_privs, default=current_privs, key="admin_privs_safe")
     if st.button("Mettre à jour privilèges", key="admin_update_priv"):
-        users[selected_user]["access"] = new_privs
-        save_users(users)
+        user_store.set_access(selected_user, new_privs)
         st.success(f"Privilèges de {selected_user} mis à jour.")
-        st.experimental_rerun()
+        st.rerun()
 
     # delete (except admin)
     if selected_user != "admin":
         if st.button(f"Supprimer {selected_user}", key="admin_del"):
-            del users[selected_user]
-            save_users(users)
+            user_store.delete_user(selected_user)
             st.success(f"Utilisateur {selected_user} supprimé.")
-            st.experimental_rerun()
+            st.rerun()
+
+    timing_panel()
+
+# Hot-path timings (labt_timing): process totals and per-session breakdown
+def timing_panel():
+    import json
+    import pandas as pd
+    with st.expander("Temps d'exécution (profilage)"):
+        enabled = st.toggle("Mesure activée", value=labt_timing.ENABLED, key="timing_enabled")
+        if enabled != labt_timing.ENABLED:
+            labt_timing.set_enabled(enabled)
+        stats = labt_timing.to_json()
+        if stats["process"]:
+            st.markdown("**Processus**")
+            st.dataframe(pd.DataFrame.from_dict(stats["process"], orient="index"))
+        else:
+            st.info("Aucune mesure pour l'instant.")
+        if stats["sessions"]:
+            sess = st.selectbox("Session", list(stats["sessions"]), key="timing_session")
+            st.dataframe(pd.DataFrame.from_dict(stats["sessions"][sess], orient="index"))
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Export JSON", data=json.dumps(stats, indent=2), file_name="labt_timings.json",
+                               mime="application/json", key="timing_json")
+        with col2:
+            st.download_button("Export Prometheus", data=labt_timing.to_prometheus(), file_name="labt_timings.prom",
+                               mime="text/plain", key="timing_prom")
 
 # Change own password (discreet deploy) for normal users
 def change_password_widget():
@@ -451,8 +830,7 @@ def change_password_widget():
         newpw = st.text_input(texts["new_pass"], type="password", key="user_newpw")
         if st.button(texts["save_pass"], key="save_user_pw"):
             if newpw:
-                users[st.session_state.user]["password"] = newpw
-                save_users(users)
+                user_store.set_password(st.session_state.user, newpw)
                 st.success("Mot de passe mis à jour." if st.session_state.lang == "FR" else "Password updated.")
                 st.session_state.show_pass_change = False
             else:
@@ -463,13 +841,15 @@ def main_app():
     texts = TEXTS[st.session_state.lang]
 
     # determine role (explicit 'role' field preferred)
-    rec = users.get(st.session_state.user, {})
+    rec = user_store.get(st.session_state.user) or {}
     role = rec.get("role", None)
     if role is None:
         role = "admin" if "admin" in rec.get("access", []) else "user"
 
     if role == "admin":
         admin_panel()
+        history_panel()
+        pdf_job_panel()
         if st.button(texts["logout"]):
             lang_keep = st.session_state.lang
             for k in list(st.session_state.keys()):
@@ -482,7 +862,7 @@ def main_app():
     # normal user
     change_password_widget()
 
-    access_list = users.get(st.session_state.user, {}).get("access", st.session_state.get("access", [])) or []
+    access_list = rec.get("access", st.session_state.get("access", [])) or []
     if isinstance(access_list, str):
         access_list = [access_list]
 
@@ -492,8 +872,11 @@ def main_app():
     if "sn" in access_list:
         sn_module()
 
+    history_panel(st.session_state.user)
+
     if st.button(texts["download_pdf"]):
         generate_pdf()
+    pdf_job_panel()
 
     if st.button(texts["logout"]):
         lang_keep = st.session_state.lang
@@ -503,7 +886,17 @@ def main_app():
         st.session_state.lang = lang_keep
         st.rerun()
 
+def session_key():
+    """user:session-id prefix, the key of this session's timing aggregate."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        sid = get_script_run_ctx().session_id[:8]
+    except Exception:
+        sid = "local"
+    return f"{st.session_state.get('user') or '-'}:{sid}"
+
 def run():
+    labt_timing.bind_session(session_key())
     if not st.session_state.logged_in:
         login_page()
     else:
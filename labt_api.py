@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# Offline HTTP/JSON API over the analytic core, for LIMS integration (asyncio, stdlib only)
+#   python labt_api.py --port 8502 --workers 4
+#   curl -u alice:secret localhost:8502/sn -d '{"image": "<base64 PNG>", "slope": 1250}'
+# Same users.json and access rights as the app (user_access_from_record), HTTP
+# Basic auth. Analyses run in a process pool; at most LABT_API_QUEUE jobs are
+# queued at once, further requests get 503 + Retry-After.
+# -----------------------
+import argparse
+import asyncio
+import base64
+import binascii
+import io
+import json
+import multiprocessing
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from labt_timing import span
+from labt_users import USER_FILE, UserStore, user_access_from_record
+
+API_PORT = int(os.environ.get("LABT_API_PORT", "8502"))
+API_WORKERS = int(os.environ.get("LABT_API_WORKERS", str(os.cpu_count() or 1)))
+API_QUEUE = int(os.environ.get("LABT_API_QUEUE", "64"))         # jobs queued or running
+MAX_BULK = int(os.environ.get("LABT_API_MAX_BULK", "500"))       # items per bulk call
+MAX_BODY = int(os.environ.get("LABT_API_MAX_MB", "256")) * 1024 * 1024
+
+# request keys passed on to analyze_chromatogram / analyze_page / analyze_signal
+IMAGE_PARAMS = ("start", "end", "slope", "t0", "t1", "unit", "trace", "box", "calibrate", "baseline", "noise", "blank")
+SIGNAL_PARAMS = ("rt_start", "rt_end", "slope", "unit", "baseline", "noise", "blank")
+NUMBER_PARAMS = ("start", "end", "slope", "t0", "t1", "rt_start", "rt_end", "dpi")
+LIST_PARAMS = {"box": 4, "blank": 2}                               # number of values
+CHOICE_PARAMS = {"trace": ("curve", "max"), "baseline": (None, "als", "quantile"), "noise": ("std", "mad", "p2p")}
+
+STATUS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+          405: "Method Not Allowed", 413: "Payload Too Large", 422: "Unprocessable Content",
+          500: "Internal Server Error",
+          503: "Service Unavailable"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def _jsonable(o):
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, (bytes, bytearray)):
+        return None
+    raise TypeError(f"{type(o).__name__} is not JSON serializable")
+
+
+def _b64(item, key):
+    try:
+        return base64.b64decode(item[key], validate=True)
+    except (binascii.Error, TypeError, ValueError):
+        raise ApiError(400, f"'{key}' is not valid base64")
+
+
+def _is_number(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _params(item, keys):
+    """Request options among keys, checked here (400) rather than in the worker."""
+    params = {k: item[k] for k in keys if k in item}
+    for k, v in params.items():
+        if k in CHOICE_PARAMS and v not in CHOICE_PARAMS[k]:
+            raise ApiError(400, f"'{k}' must be one of {', '.join(map(json.dumps, CHOICE_PARAMS[k]))}")
+        if v is None:
+            continue
+        if k in LIST_PARAMS:
+            if not isinstance(v, list) or len(v) != LIST_PARAMS[k] or not all(map(_is_number, v)):
+                raise ApiError(400, f"'{k}' must be a list of {LIST_PARAMS[k]} numbers")
+        elif k in NUMBER_PARAMS and not _is_number(v):
+            try:
+                params[k] = float(v)
+            except (TypeError, ValueError):
+                raise ApiError(400, f"'{k}' must be a number")
+    return params
+
+
+def _curve_error(item):
+    """Why item is not a valid curve request, or None."""
+    for key in ("csv_multi", "csv"):
+        if key in item:
+            return None if isinstance(item[key], str) else f"'{key}' must be CSV text"
+    if "x" not in item or "y" not in item:
+        return "one of 'x' and 'y', 'csv' or 'csv_multi' is required"
+    x, y = item["x"], item["y"]
+    if not all(isinstance(v, list) and all(map(_is_number, v)) for v in (x, y)):
+        return "'x' and 'y' must be lists of numbers"
+    if len(x) != len(y):
+        return f"'x' ({len(x)} values) and 'y' ({len(y)} values) differ in length"
+    return None
+
+
+# -----------------------
+# jobs (run in the worker processes)
+# -----------------------
+def lin_job(item):
+    """Linearity fit of one curve: {"x", "y"}, {"csv"} or {"csv_multi"} (CSV text)."""
+    from labt_core import linear_fit, linear_fit_csv, linear_fit_multi_csv
+    if _curve_error(item):
+        return {"error": _curve_error(item)}
+    try:
+        if "csv_multi" in item:
+            fits, _ = linear_fit_multi_csv(io.BytesIO(item["csv_multi"].encode("utf-8")))
+            return {"fits": fits}
+        if "csv" in item:
+            fit, _ = linear_fit_csv(io.BytesIO(item["csv"].encode("utf-8")))
+            return fit
+        return linear_fit(item["x"], item["y"])
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def image_job(data, params):
+    """S/N of one chromatogram image (bytes); analyze_chromatogram keys or error."""
+    from labt_core import analyze_chromatogram
+    try:
+        res = analyze_chromatogram(io.BytesIO(data), **params)
+        return res if res is not None else {"error": "no peak"}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def signal_job(data, name, params):
+    """S/N of one raw signal (ANDI/AIA .cdf or CSV bytes); blank in minutes."""
+    from labt_core import analyze_signal
+    from labt_io import load_signal
+    try:
+        time, intensity = load_signal(io.BytesIO(data), name)
+        res = analyze_signal(time, intensity, params.get("rt_start"), params.get("rt_end"), params.get("slope"),
+                             params.get("unit", "µg/mL"), params.get("baseline"), params.get("noise", "std"),
+                             params.get("blank"))
+        return res if res is not None else {"error": "no peak"}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def page_job(path, page_no, dpi, params):
+    """S/N of one PDF page (labt_pages.analyze_page) without its preview."""
+    from labt_pages import analyze_page
+    row = analyze_page(path, page_no, dpi, params)
+    row.pop("preview", None)
+    row.pop("preview_factor", None)
+    return row
+
+
+# -----------------------
+# service
+# -----------------------
+class Api:
+    """Routes, auth and the bounded job queue; one instance per server."""
+
+    def __init__(self, executor, store, max_queue=API_QUEUE):
+        self.executor = executor
+        self.store = store
+        self.max_queue = max_queue
+        self.pending = 0
+
+    # -- queue / backpressure --
+    def _reserve(self, n):
+        if n > MAX_BULK:
+            raise ApiError(413, f"at most {MAX_BULK} items per call")
+        # an idle server accepts any bulk call; otherwise the queue bound applies
+        if self.pending and self.pending + n > self.max_queue:
+            raise ApiError(503, "queue full, retry later", {"Retry-After": "2"})
+        self.pending += n
+
+    async def _run(self, fn, *args):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    # -- auth --
+    async def _user(self, headers, need):
+        """(name, access) of the Basic-auth user, checked against the module `need`."""
+        auth = headers.get("authorization", "")
+        if not auth.lower().startswith("basic "):
+            raise ApiError(401, "authentication required", {"WWW-Authenticate": 'Basic realm="LabT"'})
+        try:
+            name, _, password = base64.b64decode(auth[6:]).decode("utf-8").partition(":")
+        except (binascii.Error, UnicodeDecodeError):
+            raise ApiError(401, "bad credentials", {"WWW-Authenticate": 'Basic realm="LabT"'})
+        # scrypt check: off the event loop
+        rec = await asyncio.to_thread(self.store.authenticate, name, password)
+        if rec is None:
+            raise ApiError(401, "bad credentials", {"WWW-Authenticate": 'Basic realm="LabT"'})
+        access = user_access_from_record(rec)
+        if isinstance(access, str):
+            access = [access]
+        if need and need not in access and "admin" not in access:
+            raise ApiError(403, f"no '{need}' access")
+        return name, access
+
+    # -- endpoints: handler(body, user, access) --
+    async def health(self, body, user, access):
+        return {"status": "ok", "queued": self.pending, "max_queue": self.max_queue, "workers": API_WORKERS}
+
+    async def linearity(self, body, user, access):
+        """One fit; a request that cannot be fitted is an error status, not a 200."""
+        if _curve_error(body):
+            raise ApiError(400, _curve_error(body))
+        fit = (await self._lin([body], user))[0]
+        if "error" in fit:
+            raise ApiError(422, fit["error"])
+        return fit
+
+    async def linearity_bulk(self, body, user, access):
+        return {"results": await self._lin(self._items(body, "curves"), user)}
+
+    async def _lin(self, items, user):
+        from labt_cache import content_hash
+        from labt_store import save_lin
+        self._reserve(len(items))
+        fits = await asyncio.gather(*(self._run(lin_job, it) for it in items))
+        for it, fit in zip(items, fits):
+            if "error" not in fit:
+                key = content_hash(repr(sorted(it.items())).encode())
+                fitted = {k: v for k, v in (fit.get("fits") or {"": fit}).items() if "error" not in v}
+                await asyncio.to_thread(save_lin, user, key, fitted)
+        return fits
+
+    async def sn(self, body, user, access):
+        res = await self._sn(body, user)
+        if res.get("error"):
+            raise ApiError(422, res["error"])
+        return res
+
+    async def sn_bulk(self, body, user, access):
+        """Many images / signals / PDFs in one call; one result per item, in order."""
+        common = body.get("params") or {}
+        items = [dict(common, **it) for it in self._items(body, "items")]
+        # admitted as a whole: once accepted, no item is refused for a full queue
+        self._reserve(len(items))
+
+        async def one(it):
+            try:
+                return await self._sn(it, user, admitted=True)
+            except Exception as e:
+                return {"name": it.get("name"), "error": str(e)}
+        return {"results": await asyncio.gather(*(one(it) for it in items))}
+
+    async def _sn(self, item, user, admitted=False):
+        """S/N of one item; admitted=True when its queue slot is already reserved."""
+        from labt_cache import content_hash
+        from labt_store import save_sn
+        if "pdf" in item:
+            return await self._pdf(item, user, admitted)
+        try:
+            if "image" in item:
+                data = _b64(item, "image")
+                params = _params(item, IMAGE_PARAMS)
+                if params.get("blank"):
+                    params["blank"] = tuple(int(v) for v in params["blank"])
+                job, source = (image_job, data, params), "api"
+            elif "signal" in item:
+                data = _b64(item, "signal")
+                params = _params(item, SIGNAL_PARAMS)
+                job, source = (signal_job, data, item.get("name", "signal.csv"), params), "api-signal"
+            else:
+                raise ApiError(400, "one of 'image', 'signal' or 'pdf' is required")
+        except Exception:
+            if admitted:
+                self.pending -= 1
+            raise
+        if not admitted:
+            self._reserve(1)
+        res = dict(await self._run(*job), name=item.get("name"))
+        if "error" not in res:
+            await asyncio.to_thread(save_sn, user, content_hash(data), params, res, item.get("analyte"), source)
+        return res
+
+    async def _pdf(self, item, user, admitted=False):
+        """One row per page, pages analyzed in parallel."""
+        from labt_cache import content_hash
+        from labt_pages import PDF_DPI, discard_spill, page_count, spill_upload
+        from labt_store import save_sn
+        try:
+            data = _b64(item, "pdf")
+            digest = content_hash(data)
+            path = await asyncio.to_thread(spill_upload, data, digest)
+            try:
+                n = await asyncio.to_thread(page_count, path)
+            except Exception as e:
+                discard_spill(path)
+                raise ApiError(422, f"not a readable PDF: {e}")
+            params = _params(item, IMAGE_PARAMS + ("dpi",))
+        except Exception:
+            if admitted:
+                self.pending -= 1
+            raise
+        dpi = int(params.pop("dpi", None) or PDF_DPI)
+        if admitted:
+            self.pending += n - 1   # the item's slot becomes one slot per page
+        else:
+            self._reserve(n)
+        rows = await asyncio.gather(*(self._run(page_job, path, p, dpi, params) for p in range(n)))
+        for r in rows:
+            if not r.get("error"):
+                await asyncio.to_thread(save_sn, user, digest, {"page": r["page"], "dpi": dpi, **params}, r,
+                                        item.get("analyte"), "api-pdf")
+        return {"name": item.get("name"), "pages": rows}
+
+    async def report(self, body, user, access):
+        """Single report from posted results (same layout as the app's PDF)."""
+        from labt_report import build_report, submit
+        lin = body.get("lin") or {}
+        image = _b64(body, "image") if body.get("image") else None
+        pdf, _ = await asyncio.wrap_future(submit(build_report, lin.get("slope"), lin.get("intercept"),
+                                                  lin.get("fits") or {}, body.get("sn") or {}, image))
+        return pdf
+
+    async def report_batch(self, body, user, access):
+        """Combined PDF of stored results; non-admin users only get their own."""
+        from labt_report import build_batch_report, submit
+        from labt_store import history
+        filters = {"user": body.get("user") if "admin" in access else user, "analyte": body.get("analyte"),
+                   "date_from": body.get("from"), "date_to": body.get("to"), "limit": int(body.get("limit", 10000))}
+        sn_rows = await asyncio.to_thread(history, "sn", **filters)
+        lin_rows = await asyncio.to_thread(history, "lin", **filters)
+        pdf, _ = await asyncio.wrap_future(submit(build_batch_report, sn_rows, lin_rows))
+        return pdf
+
+    @staticmethod
+    def _items(body, key):
+        items = body.get(key)
+        if not isinstance(items, list) or not all(isinstance(it, dict) for it in items):
+            raise ApiError(400, f"'{key}' must be a list of objects")
+        return items
+
+    # (method, path) -> (handler, access needed; None = no auth)
+    ROUTES = {
+        ("GET", "/health"): ("health", None),
+        ("POST", "/linearity"): ("linearity", "linearity"),
+        ("POST", "/linearity/bulk"): ("linearity_bulk", "linearity"),
+        ("POST", "/sn"): ("sn", "sn"),
+        ("POST", "/sn/bulk"): ("sn_bulk", "sn"),
+        ("POST", "/report"): ("report", ""),
+        ("POST", "/report/batch"): ("report_batch", ""),
+    }
+
+    async def dispatch(self, method, path, headers, body):
+        """(status, content type, payload bytes, extra headers)."""
+        route = self.ROUTES.get((method, path))
+        if route is None:
+            if any(p == path for _, p in self.ROUTES):
+                raise ApiError(405, f"{method} not allowed on {path}")
+            raise ApiError(404, f"no route {path}")
+        name, need = route
+        user, access = (None, ()) if need is None else await self._user(headers, need)
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise ApiError(400, "body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise ApiError(400, "body must be a JSON object")
+        with span(f"api.{name}"):
+            out = await getattr(self, name)(payload, user, access)
+        if isinstance(out, bytes):
+            return 200, "application/pdf", out, {}
+        return 200, "application/json", json.dumps(out, default=_jsonable, ensure_ascii=False).encode("utf-8"), {}
+
+    # -- HTTP/1.1, one request per connection --
+    async def handle(self, reader, writer):
+        status, ctype, payload, extra = 500, "application/json", b"", {}
+        try:
+            try:
+                line = (await reader.readline()).decode("latin-1").split()
+                if len(line) != 3:
+                    raise ApiError(400, "bad request line")
+                method, target = line[0].upper(), line[1].split("?", 1)[0]
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                size = int(headers.get("content-length") or 0)
+                if size > MAX_BODY:
+                    raise ApiError(413, f"body larger than {MAX_BODY // (1024 * 1024)} MiB")
+                body = await reader.readexactly(size) if size else b""
+                status, ctype, payload, extra = await self.dispatch(method, target, headers, body)
+            except ApiError as e:
+                status, payload, extra = e.status, json.dumps({"error": str(e)}).encode("utf-8"), e.headers
+            except (ValueError, asyncio.IncompleteReadError) as e:
+                status, payload = 400, json.dumps({"error": str(e)}).encode("utf-8")
+            except Exception as e:
+                status, payload = 500, json.dumps({"error": str(e)}).encode("utf-8")
+            head = [f"HTTP/1.1 {status} {STATUS.get(status, '')}", f"Content-Type: {ctype}",
+                    f"Content-Length: {len(payload)}", "Connection: close"]
+            head += [f"{k}: {v}" for k, v in extra.items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def make_executor(workers=API_WORKERS):
+    # spawned: fork and threads (report pool, to_thread) do not mix
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+async def serve(host, port, api):
+    """Serve until SIGINT/SIGTERM, then return so the process pool shuts down cleanly."""
+    server = await asyncio.start_server(api.handle, host, port)
+    print(f"LabT API on http://{host}:{port} ({API_WORKERS} workers, queue {api.max_queue})")
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows: Ctrl+C raises KeyboardInterrupt instead
+            pass
+    async with server:
+        await stop.wait()
+
+
+def main(argv=None):
+    global API_WORKERS
+    ap = argparse.ArgumentParser(description="LabT HTTP/JSON API (linearity, S/N, PDF reports)")
+    ap.add_argument("--host", default="127.0.0.1", help="bind address (default: local only)")
+    ap.add_argument("--port", type=int, default=API_PORT)
+    ap.add_argument("-w", "--workers", type=int, default=API_WORKERS, help="analysis processes")
+    ap.add_argument("--queue", type=int, default=API_QUEUE, help="max jobs queued or running before 503")
+    ap.add_argument("--users", default=USER_FILE, help="users file (same as the app)")
+    args = ap.parse_args(argv)
+
+    API_WORKERS = args.workers
+    with make_executor(args.workers) as ex:
+        try:
+            asyncio.run(serve(args.host, args.port, Api(ex, UserStore(args.users), args.queue)))
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
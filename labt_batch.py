@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# Headless batch S/N over a directory of chromatogram images / raw signals /
+# multi-page PDF reports (one row per page)
+#   python labt_batch.py exports/ -o results.csv --slope 1250 --workers 8
+# -----------------------
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from labt_core import analyze_chromatogram, analyze_signal
+from labt_io import SIGNAL_EXTS, load_signal, load_signal_mmap
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".tif", ".tiff")
+PDF_EXTS = (".pdf",)
+FIELDS = ["file", "page", "signal", "noise", "sn", "lod_s", "loq_s", "lod_c", "loq_c",
+          "rt_text", "unit", "idx_global", "width", "error"]
+
+
+def list_images(folder, recursive=False):
+    if recursive:
+        found = [os.path.join(root, n) for root, _, names in os.walk(folder) for n in names]
+    else:
+        found = [os.path.join(folder, n) for n in os.listdir(folder)]
+    exts = IMAGE_EXTS + SIGNAL_EXTS + PDF_EXTS
+    return sorted(p for p in found if p.lower().endswith(exts) and os.path.isfile(p))
+
+
+def expand_pages(paths):
+    """Jobs (path, page): page is None for single images/signals, 0-based for PDFs."""
+    from labt_pages import page_count
+    jobs = []
+    for p in paths:
+        if p.lower().endswith(PDF_EXTS):
+            jobs += [(p, i) for i in range(page_count(p))]
+        else:
+            jobs.append((p, None))
+    return jobs
+
+
+def _analyze_one(job, params):
+    path, page = job if isinstance(job, tuple) else (job, None)
+    row = {"file": path}
+    try:
+        if page is not None:
+            from labt_pages import analyze_page
+            res = analyze_page(path, page, params.get("dpi"), {k: v for k, v in params.items() if k in
+                                                                ("start", "end", "slope", "t0", "t1", "unit", "trace", "box", "calibrate",
+                                                                 "baseline", "noise", "blank")})
+            res.pop("preview", None)
+            res.pop("preview_factor", None)
+            res.pop("seconds", None)
+            row.update(res)
+            return row
+        if path.lower().endswith(SIGNAL_EXTS):
+            time, intensity = load_signal_mmap(path) if params.get("npy_cache") else load_signal(path)
+            res = analyze_signal(time, intensity, params.get("rt_start"), params.get("rt_end"),
+                                 params.get("slope"), params.get("unit", "µg/mL"), params.get("baseline"),
+                                 params.get("noise", "std"), params.get("blank_rt"))
+        else:
+            res = analyze_chromatogram(path, **{k: v for k, v in params.items() if k not in ("rt_start", "rt_end", "npy_cache", "dpi", "blank_rt")})
+        if res is None:
+            row["error"] = "no peak"
+        else:
+            row.update(res)
+    except Exception as e:
+        row["error"] = str(e)
+    return row
+
+
+def run_batch(paths, params=None, workers=None, chunksize=4):
+    """Analyze every path (or (pdf, page) job) in a process pool; rows come back in input order."""
+    params = params or {}
+    if workers == 1:
+        return [_analyze_one(p, params) for p in paths]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(_analyze_one, paths, [params]*len(paths), chunksize=chunksize))
+
+
+def write_rows(rows, out):
+    if out.lower().endswith(".json"):
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+    else:
+        with open(out, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+            w.writeheader()
+            w.writerows(rows)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="LabT batch S/N on a folder of chromatogram images or raw signals (.cdf/.csv)")
+    ap.add_argument("folder")
+    ap.add_argument("-o", "--out", default="sn_results.csv", help=".csv or .json")
+    ap.add_argument("--start", type=int, default=None, help="Start pixel (default: detected plot area)")
+    ap.add_argument("--end", type=int, default=None, help="End pixel (default: detected plot area)")
+    ap.add_argument("--trace", choices=["curve", "max"], default="curve",
+                    help="curve: curve height inside the detected axes; max: column-wise max intensity")
+    ap.add_argument("--crop", default=None, help="left,top,right,bottom pixels kept before analysis "
+                                                 "(PDF pages: chart box at --dpi, default: detected from the axes)")
+    ap.add_argument("--ocr", action="store_true",
+                    help="calibrate time/intensity from the axis tick labels (tesseract; cached by image hash)")
+    ap.add_argument("--slope", type=float, default=None)
+    ap.add_argument("--t0", type=float, default=0.0, help="Image start time (minutes)")
+    ap.add_argument("--t1", type=float, default=0.0, help="Image end time (minutes)")
+    ap.add_argument("--rt-start", type=float, default=None, help="raw signals: zone start (minutes)")
+    ap.add_argument("--rt-end", type=float, default=None, help="raw signals: zone end (minutes)")
+    ap.add_argument("--npy-cache", action="store_true", help="raw signals: keep a memory-mapped .npy next to each file")
+    ap.add_argument("--dpi", type=int, default=150, help="PDF reports: page rendering resolution")
+    ap.add_argument("--baseline", choices=["als", "quantile"], default=None, help="baseline subtracted before the peak search")
+    ap.add_argument("--noise", choices=["std", "mad", "p2p"], default="std",
+                    help="std: zone std without the apex; mad: robust; p2p: pharmacopoeia peak-to-peak (S/N = 2H/h)")
+    ap.add_argument("--blank", default=None,
+                    help="p2p blank window: first,last pixel (images/PDF pages), in minutes for raw signals")
+    ap.add_argument("--unit", default="µg/mL")
+    ap.add_argument("-w", "--workers", type=int, default=None, help="processes (default: all cores)")
+    ap.add_argument("-r", "--recursive", action="store_true")
+    args = ap.parse_args(argv)
+
+    paths = list_images(args.folder, args.recursive)
+    if not paths:
+        print(f"No image found in {args.folder}", file=sys.stderr)
+        return 1
+    params = {"start": args.start, "end": args.end, "slope": args.slope,
+              "t0": args.t0, "t1": args.t1, "unit": args.unit, "trace": args.trace,
+              "box": [int(v) for v in args.crop.split(",")] if args.crop else None, "calibrate": args.ocr,
+              "rt_start": args.rt_start, "rt_end": args.rt_end, "npy_cache": args.npy_cache, "dpi": args.dpi,
+              "baseline": args.baseline, "noise": args.noise}
+    if args.blank:
+        lo, hi = (float(v) for v in args.blank.split(","))
+        params["blank"], params["blank_rt"] = (int(lo), int(hi)), (lo, hi)
+
+    t_start = time.perf_counter()
+    rows = run_batch(expand_pages(paths), params, args.workers)
+    elapsed = time.perf_counter() - t_start
+    write_rows(rows, args.out)
+
+    n_err = sum(1 for r in rows if r.get("error"))
+    rate = len(rows) / elapsed if elapsed > 0 else float("inf")
+    print(f"{len(rows)} images in {elapsed:.2f} s ({rate:.1f} images/s), {n_err} errors -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# Benchmarks of the analytic core on synthetic data (no Streamlit needed)
+#   python labt_bench.py                       # default sizes
+#   python labt_bench.py --quick -o bench.json # small sizes, JSON output
+#   python labt_bench.py --quick --baseline bench.json   # exit 1 on p50 regression
+# Reports latency percentiles (ms) and peak traced memory (MiB) per case.
+# -----------------------
+import argparse
+import gc
+import io
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+WIDTHS = [1_000, 10_000, 100_000, 1_000_000]
+QUICK_WIDTHS = [1_000, 10_000]
+CSV_ROWS = [1_000, 100_000, 1_000_000]
+QUICK_CSV_ROWS = [1_000, 10_000]
+
+
+# -----------------------
+# synthetic data
+# -----------------------
+def synthetic_trace(width, n_peaks=5, noise=1.0, seed=0):
+    """Baseline + Gaussian peaks + white noise, as a 1-D float trace."""
+    rng = np.random.default_rng(seed)
+    x = np.arange(width, dtype=float)
+    y = 20.0 + rng.normal(0.0, noise, width)
+    sigma = max(width / (40.0 * max(n_peaks, 1)), 2.0)
+    for c, h in zip(np.linspace(0.1, 0.9, n_peaks) * width, rng.uniform(50, 200, n_peaks)):
+        y += h * np.exp(-0.5 * ((x - c) / sigma) ** 2)
+    return y
+
+
+def synthetic_image(width, height=300, n_peaks=5, noise=1.0, seed=0):
+    """Chromatogram-like grayscale image whose column max follows synthetic_trace."""
+    from PIL import Image
+    y = np.clip(synthetic_trace(width, n_peaks, noise, seed), 0, 255).astype(np.uint8)
+    arr = np.zeros((height, width), dtype=np.uint8)
+    arr[height // 2, :] = y
+    return Image.fromarray(arr).convert("RGB")
+
+
+def synthetic_plot(width, height=600, n_peaks=5, noise=1.0, seed=0):
+    """Exported-chart-like RGB image: white background, axes, gridlines, labels
+    and synthetic_trace drawn as a dark polyline. Returns (image, true heights
+    in pixels above the x-axis for the plot columns, (x0, x1))."""
+    from PIL import Image, ImageDraw
+    x0, x1, y_axis = 80, width - 20, height - 50
+    y = synthetic_trace(x1 - x0, n_peaks, noise, seed)
+    heights = 10.0 + (y - y.min()) / (y.max() - y.min()) * (y_axis - 80)
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for gy in range(y_axis - 100, 40, -100):
+        draw.line([(x0, gy), (x1, gy)], fill=(120, 120, 120))
+    draw.line([(x0 - 1, 20), (x0 - 1, y_axis)], fill="black", width=2)
+    draw.line([(x0 - 1, y_axis), (x1, y_axis)], fill="black", width=2)
+    for gx in range(x0, x1, max((x1 - x0) // 10, 1)):
+        draw.text((gx, y_axis + 10), f"{gx - x0}", fill="black")
+    draw.text((x0 + 20, 25), "Legend: sample A", fill="black")
+    pts = list(zip(range(x0, x1), (y_axis - heights).tolist()))
+    draw.line(pts, fill=(0, 0, 160), width=2)
+    return img, heights, (x0, x1 - 1)
+
+
+def synthetic_csv(rows, n_signals=1, seed=0):
+    """Calibration CSV text: concentration + n_signals signal columns."""
+    rng = np.random.default_rng(seed)
+    x = np.repeat(np.linspace(1, 100, 10), -(-rows // 10))[:rows]
+    cols = [x] + [(i + 1) * 3.0 * x + 5.0 + rng.normal(0, 1.0, rows) for i in range(n_signals)]
+    buf = io.StringIO()
+    buf.write(",".join(["conc"] + [f"A{i}" for i in range(n_signals)]) + "\n")
+    np.savetxt(buf, np.column_stack(cols), delimiter=",", fmt="%.6g")
+    return buf.getvalue()
+
+
+# -----------------------
+# measurement
+# -----------------------
+def measure(fn, repeat=5, warmup=1):
+    """Run fn repeatedly; latency percentiles (ms) and peak traced memory (MiB)."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    p50, p90, p99 = np.percentile(times, [50, 90, 99])
+    return {"n": repeat, "p50_ms": p50, "p90_ms": p90, "p99_ms": p99, "max_ms": max(times),
+            "peak_mib": peak / 2 ** 20}
+
+
+def _repeat_for(width, repeat):
+    # keep the 1M-pixel cases affordable
+    return max(3, repeat // 4) if width >= 1_000_000 else repeat
+
+
+def bench_sn(widths, repeat, n_peaks=5, noise=1.0):
+    import labt_core as core
+    out = []
+    for w in widths:
+        r = _repeat_for(w, repeat)
+        trace = synthetic_trace(w, n_peaks, noise)
+        img = synthetic_image(w, n_peaks=n_peaks, noise=noise) if w <= 100_000 else None
+        peak = core.find_main_peak(trace, 0, w - 1)
+        cases = {
+            "find_main_peak": lambda: core.find_main_peak(trace, 0, w - 1),
+            "main_peak_als_mad": lambda: core.find_main_peak(trace, 0, w - 1, baseline="als", noise="mad"),
+            "main_peak_quant_p2p": lambda: core.find_main_peak(trace, 0, w - 1, baseline="quantile", noise="p2p"),
+            "find_all_peaks": lambda: core.find_all_peaks(trace, 0, w - 1),
+            "robust_noise": lambda: core.robust_noise(trace),
+            "lod_loq": lambda: core.calculate_lod_loq_from_noise(1234.5, peak["noise"]),
+            "decimate_minmax": lambda: core.decimate_minmax(trace, 1500),
+        }
+        if img is not None:
+            cases["extract_trace"] = lambda: core.extract_trace(img)
+        if w <= 100_000:
+            plot, _, _ = synthetic_plot(w, n_peaks=n_peaks, noise=noise)
+            cases["extract_curve"] = lambda: core.extract_curve(plot)
+        for name, fn in cases.items():
+            out.append(dict(measure(fn, r), case=name, width=w, peaks=n_peaks, noise=noise))
+    return out
+
+
+def bench_linearity(rows_list, repeat, n_signals=(1, 40)):
+    import labt_core as core
+    out = []
+    for rows in rows_list:
+        r = _repeat_for(rows, repeat)
+        for k in n_signals:
+            data = synthetic_csv(rows, k).encode()
+            fn = core.linear_fit_csv if k == 1 else core.linear_fit_multi_csv
+            # BytesIO shares the buffer, so the upload itself is not counted as peak memory
+            out.append(dict(measure(lambda: fn(io.BytesIO(data)), r), case=fn.__name__, width=rows, signals=k))
+        x = np.linspace(1, 100, rows)
+        y = 3.0 * x + 5.0
+        out.append(dict(measure(lambda: core.linear_fit(x, y), r), case="linear_fit", width=rows, signals=1))
+    return out
+
+
+def bench_pdf(repeat, widths=(1_000, 10_000)):
+    from labt_report import build_report, build_batch_report
+    out = []
+    fit = {"slope": 3.0, "intercept": 5.0, "r2": 0.999, "n": 10}
+    snr = {"signal": 150.0, "noise": 1.0, "sn": 150.0, "lod_s": 3.3, "loq_s": 10.0,
+           "lod_c": 1.1, "loq_c": 3.3, "rt_text": "5.000 min", "unit": "µg/mL"}
+    for w in widths:
+        img = synthetic_image(w)
+        out.append(dict(measure(lambda: build_report(3.0, 5.0, {}, snr, img), repeat), case="build_report", width=w))
+    rows = [dict(snr, created_at="2026-01-01T00:00:00", user="bench", analyte=f"A{i % 40}",
+                 image_hash=f"{i:040x}", **fit) for i in range(500)]
+    out.append(dict(measure(lambda: build_batch_report(rows, rows, "bench"), repeat), case="build_batch_report", width=500))
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="LabT analytic core benchmarks")
+    ap.add_argument("--quick", action="store_true", help="small sizes only")
+    ap.add_argument("--repeat", type=int, default=10)
+    ap.add_argument("--only", choices=["sn", "linearity", "pdf"], action="append")
+    ap.add_argument("--peaks", type=int, nargs="+", default=[5], help="peak counts of the synthetic traces")
+    ap.add_argument("--noise", type=float, nargs="+", default=[1.0], help="noise std levels")
+    ap.add_argument("-o", "--out", default=None, help="write results as JSON")
+    ap.add_argument("--baseline", default=None, help="JSON from a previous run to compare p50 against")
+    ap.add_argument("--tolerance", type=float, default=1.5, help="allowed p50 slowdown factor vs baseline")
+    args = ap.parse_args(argv)
+
+    suites = args.only or ["sn", "linearity", "pdf"]
+    results = []
+    if "sn" in suites:
+        for n_peaks in args.peaks:
+            for noise in args.noise:
+                results += bench_sn(QUICK_WIDTHS if args.quick else WIDTHS, args.repeat, n_peaks, noise)
+    if "linearity" in suites:
+        results += bench_linearity(QUICK_CSV_ROWS if args.quick else CSV_ROWS, args.repeat)
+    if "pdf" in suites:
+        results += bench_pdf(args.repeat)
+
+    print(f"{'case':<22}{'size':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'peak MiB':>10}")
+    for r in results:
+        size = f"{r['width']}" + (f"x{r['signals']}" if r.get("signals", 1) > 1 else "")
+        print(f"{r['case']:<22}{size:>10}{r['p50_ms']:>10.2f}{r['p90_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['peak_mib']:>10.1f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        return compare(results, args.baseline, args.tolerance)
+    return 0
+
+
+def _key(r):
+    return (r["case"], r["width"], r.get("signals", 1), r.get("peaks"), r.get("noise"))
+
+
+def compare(results, baseline_path, tolerance):
+    """Print cases whose p50 grew by more than tolerance x; 1 if any did."""
+    with open(baseline_path) as f:
+        base = {_key(r): r for r in json.load(f)}
+    status = 0
+    for r in results:
+        b = base.get(_key(r))
+        # sub-0.1 ms timings are mostly noise
+        if b and r["p50_ms"] > tolerance * max(b["p50_ms"], 0.1):
+            print(f"REGRESSION {r['case']} {r['width']}: {b['p50_ms']:.2f} -> {r['p50_ms']:.2f} ms")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# Process-wide caches shared by all Streamlit sessions (content-hash keyed)
+# -----------------------
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from labt_core import load_image, image_trace, annotate_peak_on_image
+from labt_io import load_signal
+from labt_timing import span
+
+
+def content_hash(data):
+    """Hex digest of raw upload bytes, used as cache / store key."""
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def nbytes_of(value):
+    """Rough in-memory size of cached values (arrays, PIL images, bytes, tuples)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, "getbands"):  # PIL image
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes_of(v) for v in value)
+    if isinstance(value, dict):
+        return sum(nbytes_of(v) for v in value.values())
+    return 64
+
+
+class LRUCache:
+    """Thread-safe LRU bounded by total bytes; least recently used entries are evicted first."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key][0]
+
+    def put(self, key, value, nbytes=None):
+        nbytes = nbytes_of(value) if nbytes is None else int(nbytes)
+        with self._lock:
+            if key in self._data:
+                self.size -= self._data.pop(key)[1]
+            if nbytes > self.max_bytes:
+                # never keep an entry larger than the whole budget
+                return value
+            self._data[key] = (value, nbytes)
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, (_, n) = self._data.popitem(last=False)
+                self.size -= n
+                self.evictions += 1
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value, n = self._data.pop(key)
+            self.size -= n
+            return value
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self):
+        return {"entries": len(self._data), "bytes": self.size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+# decoded RGB image + 1-D trace, keyed by upload content hash (+ extraction options)
+IMAGE_CACHE = LRUCache(int(os.environ.get("LABT_IMAGE_CACHE_MB", "512")) * 1024 * 1024)
+
+
+def cached_image_and_trace(data, digest=None, method="curve", box=None):
+    """Decode upload bytes once per content; returns (digest, RGB image, trace, (x0, x1)).
+
+    method/box are passed to image_trace/load_image; (x0, x1) is the detected
+    plot area. The returned objects are shared between sessions: copy the
+    image before drawing on it. The trace is made read-only.
+    """
+    digest = digest or content_hash(data)
+    box = tuple(int(v) for v in box) if box else None
+    key = (digest, method, box)
+    hit = IMAGE_CACHE.get(key)
+    if hit is not None:
+        return (digest,) + hit
+    img = load_image(io.BytesIO(data), box)
+    trace, area = image_trace(img, method)
+    trace.flags.writeable = False
+    IMAGE_CACHE.put(key, (img, trace, area))
+    return digest, img, trace, area
+
+
+def source_image(digest, method="curve", box=None):
+    """Decoded upload by content hash, for loaders kept in the session instead of the
+    upload itself: the IMAGE_CACHE entry, else the file written by labt_pages.spill_upload."""
+    box = tuple(int(v) for v in box) if box else None
+    hit = IMAGE_CACHE.get((digest, method, box))
+    if hit is not None:
+        return hit[0]
+    from labt_pages import spill_path
+    path = spill_path(digest, ".img")
+    if not os.path.exists(path):
+        raise FileNotFoundError("image source no longer available (upload it again)")
+    return load_image(path, box)
+
+
+# annotated images as PNG bytes, one budget for all sessions (sessions only keep an AnnotatedImage)
+ANNOT_CACHE = LRUCache(int(os.environ.get("LABT_ANNOT_CACHE_MB", "64")) * 1024 * 1024)
+
+
+def png_bytes(img, compress_level=6):
+    buf = io.BytesIO()
+    img.save(buf, "PNG", compress_level=compress_level)
+    return buf.getvalue()
+
+
+class AnnotatedImage:
+    """Peak-annotated image kept as a recipe: source loader, apex column and label.
+
+    load() returns the full-size RGB source (shared, never drawn on);
+    load_preview(), if given, a cheaper (reduced RGB copy, reduction factor).
+    Renderings are PNG bytes in ANNOT_CACHE under key, re-made after eviction.
+    """
+
+    def __init__(self, key, load, x, text, load_preview=None):
+        self.key = key
+        self.load = load
+        self.x = int(x)
+        self.text = text
+        self.load_preview = load_preview
+
+    def preview(self, max_width=1600):
+        """Reduced annotated PNG for display."""
+        ck = (self.key, "preview", max_width)
+        data = ANNOT_CACHE.get(ck)
+        if data is None:
+            with span("annot.preview"):
+                if self.load_preview is not None:
+                    prev, factor = self.load_preview()
+                else:
+                    img = self.load()
+                    factor = -(-img.width // max_width)
+                    prev = img.reduce(factor) if factor > 1 else img.copy()
+                annotate_peak_on_image(prev, self.x // factor, 10, self.text)
+                data = ANNOT_CACHE.put(ck, png_bytes(prev, 1))
+        return data
+
+    def full(self):
+        """Full-resolution annotated PNG (built for the PDF report only)."""
+        ck = (self.key, "full")
+        data = ANNOT_CACHE.get(ck)
+        if data is None:
+            with span("annot.full"):
+                img = annotate_peak_on_image(self.load().copy(), self.x, 10, self.text)
+                data = ANNOT_CACHE.put(ck, png_bytes(img))
+        return data
+
+
+def cached_signal(data, name, digest=None):
+    """Parse raw signal upload bytes once per content; returns (digest, time, intensity)."""
+    digest = digest or content_hash(data)
+    hit = IMAGE_CACHE.get(digest)
+    if hit is not None:
+        return (digest,) + hit
+    time, intensity = load_signal(data, name)
+    time.flags.writeable = False
+    intensity.flags.writeable = False
+    IMAGE_CACHE.put(digest, (time, intensity))
+    return digest, time, intensity
+
+
+def cached_calibration(digest, img, box=None):
+    """OCR axis calibration (labt_ocr.calibrate_axes), run at most once per image/crop.
+
+    Kept in IMAGE_CACHE and in the result store, so it survives restarts.
+    img may be a callable returning the image, called only when OCR has to run.
+    None when OCR is not available.
+    """
+    from labt_ocr import calibrate_axes, ocr_available
+    from labt_store import lookup_calibration, save_calibration
+    if not ocr_available():
+        return None
+    box = tuple(int(v) for v in box) if box else None
+    key = (digest, "ocr", box)
+    params = {"box": list(box) if box else None}
+    cal = IMAGE_CACHE.get(key)
+    if cal is None:
+        cal = lookup_calibration(digest, params)
+        if cal is None:
+            cal = calibrate_axes(img() if callable(img) else img)
+            save_calibration(digest, params, cal)
+        IMAGE_CACHE.put(key, cal, 512)
+    return cal
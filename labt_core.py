@@ -0,0 +1,818 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# LabT analytic core (no Streamlit): trace extraction, peak, noise, LOD/LOQ
+# SciPy, PIL and pandas are imported inside the functions that need them so
+# that importing this module (and the login page) stays cheap.
+# -----------------------
+import io
+
+import numpy as np
+
+from labt_timing import span
+
+# half-width (pixels) of the window excluded around the apex for noise
+PEAK_EXCLUSION = 3
+
+
+def calculate_lod_loq_from_noise(slope, noise):
+    lod_signal = 3.3 * noise
+    loq_signal = 10.0 * noise
+    if slope and np.isfinite(slope):
+        lod_conc = lod_signal / slope
+        loq_conc = loq_signal / slope
+    else:
+        lod_conc = None
+        loq_conc = None
+    return lod_signal, loq_signal, lod_conc, loq_conc
+
+
+def load_image(src, box=None):
+    """Open an image (path, file-like or PIL image) as RGB.
+
+    box=(left, upper, right, lower) crops before the RGB conversion, so only
+    the kept region is ever held as RGB.
+    """
+    from PIL import Image
+    with span("image.decode"):
+        img = src if isinstance(src, Image.Image) else Image.open(src)
+        if box is not None:
+            img = img.crop(tuple(int(v) for v in box))
+        return img.convert("RGB")
+
+
+def annotate_peak_on_image(img_pil, x_pixel, y_pixel, text):
+    """Red dot and label at (x_pixel, y_pixel), drawn in place."""
+    from PIL import ImageDraw, ImageFont
+    draw = ImageDraw.Draw(img_pil)
+    r = 6
+    draw.ellipse((x_pixel-r, y_pixel-r, x_pixel+r, y_pixel+r), fill="red")
+    try:
+        font = ImageFont.load_default()
+        draw.text((x_pixel+8, max(0, y_pixel-12)), text, fill="red", font=font)
+    except Exception:
+        draw.text((x_pixel+8, max(0, y_pixel-12)), text, fill="red")
+    return img_pil
+
+
+def extract_trace(img):
+    """Column-wise max of the grayscale image -> 1-D float trace."""
+    with span("trace.grayscale"):
+        arr = np.asarray(img.convert("L"))
+    with span("trace.extract"):
+        return arr.max(axis=0).astype(float)
+
+
+# curve extraction: a pixel is "ink" when it differs this much from the background
+INK_CONTRAST = 64
+# rows inked over this fraction of the width are axis candidates; columns over
+# this fraction of the plot height are the y-axis, frame or vertical gridlines
+HLINE_FRACTION = 0.5
+VLINE_FRACTION = 0.9
+# rows inked over this fraction of the plot width are gridlines (a flat curve
+# baseline is interrupted by its peaks and stays below it)
+GRID_FRACTION = 0.97
+# chart on a report page: both axes at least this fraction of the page, kept
+# with this margin (pixels); an L over this fraction of both sides is a page frame
+CHART_MIN_FRACTION = 0.15
+CHART_MARGIN = 8
+PAGE_FRAME_FRACTION = 0.95
+
+
+def _line_runs_edge(is_line, from_end):
+    """Index just inside the outermost run of line pixels (None if no line)."""
+    idx = np.flatnonzero(is_line)
+    if idx.size == 0:
+        return None
+    if from_end:
+        i = idx[-1]
+        while i - 1 >= 0 and is_line[i - 1]:
+            i -= 1
+        return i
+    i = idx[0]
+    while i + 1 < is_line.size and is_line[i + 1]:
+        i += 1
+    return i + 1
+
+
+def plot_area(gray):
+    """Plot region of a grayscale chart array, inside its axes/frame.
+
+    Returns (top, bottom, left, right, bg, ink, hlines, vlines): rows
+    top..bottom-1 and columns left..right-1 are inside the axes, bottom being
+    the x-axis row (or the image height) and top the row below the topmost
+    long line of the upper half (frame or top gridline, 0 if none). bg is the
+    background level, ink the mask of pixels differing from it; hlines/vlines
+    flag the axis and gridline rows/columns.
+    """
+    h, w = gray.shape
+    bg = int(np.median(gray[::4, ::4]))
+    ink = (gray < bg - INK_CONTRAST) | (gray > bg + INK_CONTRAST)
+    long_rows = np.count_nonzero(ink, axis=1) > HLINE_FRACTION * w
+    bottom = _line_runs_edge(long_rows, from_end=True)
+    bottom = h if bottom is None or bottom < h // 2 else bottom
+    top = _line_runs_edge(long_rows[:h // 2], from_end=False) or 0
+    vlines = np.count_nonzero(ink[top:bottom], axis=0) > VLINE_FRACTION * max(bottom - top, 1)
+    left = _line_runs_edge(vlines[:w // 2], from_end=False) or 0
+    right = _line_runs_edge(vlines[w // 2:], from_end=True)
+    right = w if right is None else w // 2 + right
+    hlines = np.count_nonzero(ink[:, left:right], axis=1) >= GRID_FRACTION * max(right - left, 1)
+    return top, bottom, left, right, bg, ink, hlines, vlines
+
+
+def _runs(mask):
+    """(last index, column, length) of every run of True along axis 0 of a 2-D mask."""
+    c = np.cumsum(mask, axis=0, dtype=np.int32)
+    run = c - np.maximum.accumulate(np.where(mask, 0, c), axis=0)
+    end = mask.copy()
+    end[:-1] &= ~mask[1:]
+    r, col = np.nonzero(end)
+    return r, col, run[r, col]
+
+
+def chart_box(img):
+    """(left, upper, right, lower) of the chart on a report page image, or None.
+
+    plot_area expects the x-axis in the lower half of the image, which a page
+    with a peak table or text under the chromatogram breaks. The chart is found
+    by its axes instead: a vertical ink run (y-axis or frame side) whose lower
+    end meets a horizontal run going right (x-axis), both at least
+    CHART_MIN_FRACTION of the page. The largest such L that is not a page frame
+    wins; the box keeps CHART_MARGIN pixels around it.
+    """
+    with span("trace.chart_box"):
+        gray = np.asarray(img.convert("L"))
+        h, w = gray.shape
+        bg = int(np.median(gray[::4, ::4]))
+        ink = (gray < bg - INK_CONTRAST) | (gray > bg + INK_CONTRAST)
+        v_end, v_col, v_len = _runs(ink)
+        keep = v_len >= CHART_MIN_FRACTION * h
+        v_end, v_col, v_len = v_end[keep], v_col[keep], v_len[keep]
+        h_end, h_row, h_len = _runs(ink.T)
+        keep = h_len >= CHART_MIN_FRACTION * w
+        h_end, h_row, h_len = h_end[keep], h_row[keep], h_len[keep]
+        if v_end.size == 0 or h_end.size == 0:
+            return None
+        # x-axis rows reach the bottom of the y-axis run and start at (or left of) its column
+        tol = CHART_MARGIN // 2
+        meets = ((np.abs(h_row[None, :] - v_end[:, None]) <= tol)
+                 & (h_end[None, :] - h_len[None, :] + 1 <= v_col[:, None] + tol)
+                 & (h_end[None, :] - v_col[:, None] >= CHART_MIN_FRACTION * w))
+        vi, hi = np.nonzero(meets)
+        if vi.size == 0:
+            return None
+        height, width = v_len[vi], h_end[hi] - v_col[vi] + 1
+        frame = (height >= PAGE_FRAME_FRACTION * h) & (width >= PAGE_FRAME_FRACTION * w)
+        if frame.all():
+            return None
+        best = np.argmax(np.where(frame, -1, height * width))
+        v, hh = vi[best], hi[best]
+        top = v_end[v] - v_len[v] + 1
+        return (int(max(v_col[v] - CHART_MARGIN, 0)), int(max(top - CHART_MARGIN, 0)),
+                int(min(h_end[hh] + 1 + CHART_MARGIN, w)), int(min(v_end[v] + 1 + CHART_MARGIN, h)))
+
+
+def extract_curve(img):
+    """Curve height above the x-axis, per column, for a plotted chromatogram.
+
+    Axes, frame and gridlines are detected and ignored; in each column the
+    curve is the top of the lowest run of ink pixels, so legends and labels
+    above it are skipped; the anti-aliased pixel above gives a sub-pixel
+    correction. Works for dark-on-light and light-on-dark charts.
+    Returns (trace, (x0, x1)): one value per image column, x0..x1 being the
+    plot-area columns (outside they repeat the edge value).
+    """
+    with span("trace.grayscale"):
+        gray = np.asarray(img.convert("L"))
+    with span("trace.curve"):
+        h, w = gray.shape
+        # top is not used: the topmost long line may be a gridline the peaks
+        # cross, so the curve is read from the image top
+        _, bottom, left, right, bg, ink, hlines, vlines = plot_area(gray)
+        if bottom < 2 or right - left < 2:
+            bottom, left, right = h, 0, w
+        ink = ink[:bottom, left:right].copy()
+        ink[:, vlines[left:right]] = False
+        gridrow = hlines[:bottom]
+        ink[gridrow] = False
+        n_rows = ink.shape[0]
+        cols = np.arange(ink.shape[1])
+        has_ink = ink.any(axis=0)
+        # lowest ink run of each column (legends/labels sit above the curve);
+        # gridline rows bridge the run instead of splitting it
+        last = n_rows - 1 - np.argmax(ink[::-1], axis=0)
+        gap = ~ink & ~gridrow[:, None] & (np.arange(n_rows)[:, None] < last[None, :])
+        row = np.where(gap.any(axis=0), n_rows - np.argmax(gap[::-1], axis=0), 0)
+        above = gray[np.maximum(row - 1, 0), left + cols].astype(float)
+        frac = np.where(row > 0, np.abs(above - bg) / 255.0, 0.0)
+        height = (n_rows - row) + np.clip(frac, 0.0, 0.999)
+        if has_ink.any():
+            height = np.interp(cols, cols[has_ink], height[has_ink])
+        else:
+            height = np.zeros(ink.shape[1])
+        trace = np.empty(w, dtype=float)
+        trace[left:right] = height
+        trace[:left] = height[0]
+        trace[right:] = height[-1]
+    return trace, (int(left), int(right) - 1)
+
+
+def image_trace(img, method="curve"):
+    """(trace, (x0, x1)) with the chosen extraction: "curve" or legacy "max"."""
+    if method == "max":
+        return extract_trace(img), (0, img.width - 1)
+    return extract_curve(img)
+
+
+def find_main_peak(trace, start, end, baseline=None, noise="std", blank=None):
+    """Tallest peak in trace[start:end+1] and its noise.
+
+    baseline: None, "als" or "quantile" (see estimate_baseline), subtracted
+    from the zone before the peak search. noise: "std" (std of the zone
+    without +/- PEAK_EXCLUSION pixels around the apex), "mad" or "p2p" (see
+    peak_noise). blank=(first, last) global indices of a blank window for "p2p".
+    Returns a dict (idx_global, signal, noise, sn) or None if no peak.
+    """
+    found = locate_peak(trace, start, end, baseline)
+    if found is None:
+        return None
+    zone, idx_rel = found
+    return peak_result(trace, zone, start, idx_rel, noise, blank, baseline)
+
+
+def locate_peak(trace, start, end, baseline=None):
+    """(zone, idx_rel): the searched (baseline-corrected) zone and the apex of
+    its tallest peak, or None. First half of find_main_peak."""
+    from scipy.signal import find_peaks
+    zone = trace[start:end+1]
+    if baseline:
+        zone = np.asarray(zone, dtype=float) - estimate_baseline(zone, baseline)
+    peaks, _ = find_peaks(zone)
+    if len(peaks) == 0:
+        return None
+    return zone, int(peaks[np.argmax(zone[peaks])])
+
+
+def peak_result(trace, zone, start, idx_rel, noise="std", blank=None, baseline=None):
+    """Signal, noise and S/N of a located peak. Second half of find_main_peak."""
+    H = float(zone[idx_rel])
+    if noise != "std":
+        h = peak_noise(trace, zone, start, idx_rel, noise, blank, baseline)
+    else:
+        left = max(0, idx_rel - PEAK_EXCLUSION)
+        right = min(len(zone) - 1, idx_rel + PEAK_EXCLUSION)
+        rest = np.concatenate([zone[:left], zone[right+1:]]) if (left > 0 or right < len(zone)-1) else np.array([])
+        h = float(np.std(rest)) if rest.size > 0 else float(np.std(zone))
+    return {"idx_global": start + idx_rel, "signal": H, "noise": h, "sn": H / h if h > 0 else None}
+
+
+# -----------------------
+# baseline and noise estimators (linear time, sparse/vectorized)
+# -----------------------
+ALS_LAMBDA = 1e6      # smoothness of the ALS baseline (larger = stiffer)
+ALS_P = 0.01          # asymmetry: weight of points above the baseline
+ALS_ITER = 10
+ALS_MAX_POINTS = 4000  # longer traces are fitted on block means (keeps lam size-independent)
+QUANTILE = 0.1        # rolling-quantile baseline level
+P2P_WIDTHS = 20       # Ph. Eur. 2.2.46: noise window = 20 x peak width at half height...
+P2P_MIN_WIDTHS = 5    # ...and at least 5 x when the peaks leave no room for 20 x
+
+
+def baseline_als(y, lam=ALS_LAMBDA, p=ALS_P, n_iter=ALS_ITER):
+    """Asymmetric least squares baseline (Eilers & Boelens).
+
+    Minimizes sum w (y - z)^2 + lam sum (d2 z)^2, with w = p above the
+    baseline and 1 - p below; each iteration is one banded (pentadiagonal)
+    Cholesky solve, O(n). Traces longer than ALS_MAX_POINTS are fitted on
+    block means and interpolated back.
+    """
+    from scipy.linalg import solveh_banded
+    y = np.asarray(y, dtype=float)
+    n = y.size
+    if n < 5:
+        return np.full(n, np.median(y) if n else 0.0)
+    if n > ALS_MAX_POINTS:
+        size = -(-n // ALS_MAX_POINTS)
+        n_blocks = -(-n // size)
+        means = np.pad(y, (0, n_blocks * size - n), mode="edge").reshape(n_blocks, size).mean(axis=1)
+        centres = np.minimum(np.arange(n_blocks) * size + (size - 1) / 2.0, n - 1)
+        return np.interp(np.arange(n), centres, baseline_als(means, lam, p, n_iter))
+    # upper banded form of lam * D'D, D = second differences
+    ab = np.zeros((3, n))
+    ab[0, 2:] = lam
+    ab[1, 1:] = -4.0 * lam
+    ab[1, 1] = ab[1, -1] = -2.0 * lam
+    ab[2, :] = 6.0 * lam
+    ab[2, 0] = ab[2, -1] = lam
+    ab[2, 1] = ab[2, -2] = 5.0 * lam
+    w = np.ones(n)
+    z = y
+    for _ in range(n_iter):
+        band = ab.copy()
+        band[2] += w
+        z = solveh_banded(band, w * y, check_finite=False)
+        w_new = np.where(y > z, p, 1.0 - p)
+        if np.array_equal(w_new, w):
+            break
+        w = w_new
+    return z
+
+
+def baseline_quantile(y, window=None, q=QUANTILE):
+    """Rolling-quantile baseline: q-quantile of consecutive blocks of window/2
+    points, linearly interpolated between block centres (default window n/20)."""
+    y = np.asarray(y, dtype=float)
+    n = y.size
+    window = max(int(window or n // 20), 4)
+    size = max(window // 2, 2)
+    n_blocks = -(-n // size)
+    if n_blocks < 2:
+        return np.full(n, np.quantile(y, q) if n else 0.0)
+    padded = np.pad(y, (0, n_blocks * size - n), mode="edge").reshape(n_blocks, size)
+    levels = np.quantile(padded, q, axis=1)
+    centres = np.minimum(np.arange(n_blocks) * size + size / 2.0, n - 1)
+    return np.interp(np.arange(n), centres, levels)
+
+
+def estimate_baseline(y, method="als", **opts):
+    if method == "als":
+        return baseline_als(y, **opts)
+    if method == "quantile":
+        return baseline_quantile(y, **opts)
+    raise ValueError(f"baseline inconnue: {method}")
+
+
+def mad_noise(y):
+    """Noise std from the median absolute deviation (peaks are outliers)."""
+    y = np.asarray(y, dtype=float)
+    return float(1.4826 * np.median(np.abs(y - np.median(y)))) if y.size else 0.0
+
+
+def p2p_noise(y):
+    """Peak-to-peak amplitude of a window after removing its linear drift."""
+    y = np.asarray(y, dtype=float)
+    if y.size < 3:
+        return 0.0
+    x = np.arange(y.size)
+    slope, intercept = np.polyfit(x, y, 1)
+    return float(np.ptp(y - (slope * x + intercept)))
+
+
+def peak_noise(trace, zone, start, idx_rel, method="mad", blank=None, baseline=None):
+    """Noise h of the main peak for find_main_peak.
+
+    "mad": MAD of the (baseline-corrected) zone without the peak region.
+    "p2p": pharmacopoeia peak-to-peak noise; returned as h/2 so that
+    signal/noise is the Ph. Eur. S/N = 2H/h and LOD = 3.3 h/2. The window is
+    blank=(first, last) in global indices (detrended), or by default the
+    median peak-to-peak of the zone windows clear of every detected peak
+    (+/- 2 FWHM around each apex), 20 x FWHM wide, or down to 5 x FWHM when
+    the peaks leave no room; ValueError when none fits (give a blank window).
+    """
+    from scipy.ndimage import maximum_filter1d, minimum_filter1d
+    from scipy.signal import find_peaks, peak_widths
+    zone = np.asarray(zone, dtype=float)
+    n = zone.size
+    fwhm = float(peak_widths(zone, [idx_rel], rel_height=0.5)[0][0])
+    half = int(np.ceil(max(fwhm, 1.0) * 2))
+    away = np.ones(n, dtype=bool)
+    away[max(0, idx_rel - half):idx_rel + half + 1] = False
+    if method == "mad":
+        return mad_noise(zone[away] if away.sum() > 2 else zone)
+    if method != "p2p":
+        raise ValueError(f"bruit inconnu: {method}")
+    if blank is not None:
+        b0, b1 = int(blank[0]), int(blank[1])
+        return p2p_noise(np.asarray(trace[b0:b1 + 1], dtype=float)) / 2.0
+    if baseline is None:
+        # no baseline correction: remove the drift with a stiff ALS first
+        zone = zone - baseline_als(zone)
+    # the other peaks of the zone are not noise either: same exclusion as the main peak
+    peaks, props = find_peaks(zone, prominence=(10.0 * robust_noise(zone) or None))
+    if len(peaks):
+        r = np.ceil(np.maximum(_peak_limits(zone, peaks, props)[1], 1.0) * 2).astype(int)
+        away &= ~_region_mask(n, np.clip(peaks - r, 0, n - 1), np.clip(peaks + r, 0, n - 1))
+    for widths in range(P2P_WIDTHS, P2P_MIN_WIDTHS - 1, -5):
+        w = int(min(max(widths * fwhm, 5), n))
+        # windows (centred) that do not touch any peak region
+        ok = minimum_filter1d(away.astype(np.uint8), w, mode="nearest").astype(bool)
+        if ok.any():
+            rng = maximum_filter1d(zone, w, mode="nearest") - minimum_filter1d(zone, w, mode="nearest")
+            return float(np.median(rng[ok])) / 2.0
+    raise ValueError(f"aucune fenêtre de {P2P_MIN_WIDTHS} x FWHM sans pic : indiquer une fenêtre de blanc")
+
+
+def pixel_to_minutes(idx, width, t0=0.0, t1=0.0):
+    """Map pixel index (scalar or array) to minutes; None without a t0/t1 scale."""
+    if (t1 > t0) and (width > 1):
+        return t0 + (np.asarray(idx) / (width - 1)) * (t1 - t0)
+    return None
+
+
+def retention_text(idx_global, width, t0=0.0, t1=0.0):
+    """Peak position as minutes when a t0/t1 scale is given, pixels otherwise."""
+    rt_minutes = pixel_to_minutes(idx_global, width, t0, t1)
+    if rt_minutes is not None:
+        return f"{float(rt_minutes):.3f} min"
+    return f"{idx_global} px"
+
+
+def robust_noise(y):
+    """Noise std from the MAD of first differences (insensitive to peaks)."""
+    if y.size < 3:
+        return 0.0
+    d = np.diff(y)
+    return float(1.4826 * np.median(np.abs(d - np.median(d))) / np.sqrt(2))
+
+
+def _peak_limits(zone, peaks, props):
+    """(prominence, fwhm, lo, hi) of find_peaks results: lo..hi are the integration
+    limits, half-height crossings widened by half a FWHM on each side."""
+    from scipy.signal import peak_prominences, peak_widths
+    n = zone.size
+    if "prominences" in props:
+        prom, lb, rb = props["prominences"], props["left_bases"], props["right_bases"]
+    else:
+        prom, lb, rb = peak_prominences(zone, peaks)
+    fwhm, _, left_ips, right_ips = peak_widths(zone, peaks, rel_height=0.5, prominence_data=(prom, lb, rb))
+    lo = np.clip(np.floor(left_ips - fwhm / 2.0).astype(int), 0, n - 1)
+    hi = np.clip(np.ceil(right_ips + fwhm / 2.0).astype(int), 0, n - 1)
+    return prom, fwhm, lo, hi
+
+
+def _region_mask(n, lo, hi):
+    """Boolean mask of the pixels inside any [lo, hi] interval, without a pixel loop."""
+    marks = np.zeros(n + 1, dtype=int)
+    np.add.at(marks, lo, 1)
+    np.add.at(marks, hi + 1, -1)
+    return np.cumsum(marks[:-1]) > 0
+
+
+def find_all_peaks(trace, start, end, min_prominence=None, noise_window=None):
+    """Every peak in trace[start:end+1], computed in one vectorized pass.
+
+    min_prominence defaults to 10x the robust noise of the zone (0 keeps every
+    local maximum). Noise for each peak is the std of the non-peak pixels within
+    +/- noise_window pixels of the apex (default 10x the peak FWHM).
+    Returns a dict of equal-length arrays: idx_global, signal, prominence,
+    fwhm, area, noise, sn.
+    """
+    from scipy.signal import find_peaks
+    zone = np.asarray(trace[start:end+1], dtype=float)
+    n = zone.size
+    if min_prominence is None:
+        min_prominence = 10.0 * robust_noise(zone)
+    peaks, props = find_peaks(zone, prominence=(min_prominence or None))
+    if len(peaks) == 0:
+        return {k: np.array([]) for k in ("idx_global", "signal", "prominence", "fwhm", "area", "noise", "sn")}
+    prom, fwhm, lo, hi = _peak_limits(zone, peaks, props)
+
+    # area above the straight line joining the two limits (trapezoid via cumsum)
+    cs = np.concatenate(([0.0], np.cumsum((zone[1:] + zone[:-1]) / 2.0)))
+    area = (cs[hi] - cs[lo]) - (zone[lo] + zone[hi]) / 2.0 * (hi - lo)
+
+    is_base = ~_region_mask(n, lo, hi)
+
+    # windowed std of baseline pixels from cumulative sums (centred for precision)
+    yb = np.where(is_base, zone - zone.mean(), 0.0)
+    c_n = np.concatenate(([0], np.cumsum(is_base)))
+    c_s = np.concatenate(([0.0], np.cumsum(yb)))
+    c_q = np.concatenate(([0.0], np.cumsum(yb * yb)))
+    half = np.maximum(10 * fwhm, 20).astype(int) if noise_window is None else np.full(len(peaks), int(noise_window))
+    w_lo = np.clip(peaks - half, 0, n)
+    w_hi = np.clip(peaks + half + 1, 0, n)
+    cnt = c_n[w_hi] - c_n[w_lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (c_s[w_hi] - c_s[w_lo]) / cnt
+        var = (c_q[w_hi] - c_q[w_lo]) / cnt - mean * mean
+    noise = np.sqrt(np.clip(var, 0.0, None))
+    fallback = float(np.std(zone[is_base])) if is_base.any() else float(np.std(zone))
+    noise = np.where(cnt > 1, noise, fallback)
+
+    signal = zone[peaks]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sn = np.where(noise > 0, signal / noise, np.nan)
+    return {
+        "idx_global": start + peaks,
+        "signal": signal,
+        "prominence": prom,
+        "fwhm": fwhm,
+        "area": area,
+        "noise": noise,
+        "sn": sn,
+    }
+
+
+def lod_loq(noise, slope):
+    """LOD/LOQ (signal, conc); conc is None without a usable slope."""
+    if slope is not None:
+        return calculate_lod_loq_from_noise(slope, noise)
+    return 3.3*noise, 10*noise, None, None
+
+
+def analyze_chromatogram(image, start=None, end=None, slope=None, t0=0.0, t1=0.0, unit="µg/mL",
+                         trace="curve", box=None, calibrate=False, baseline=None, noise="std", blank=None):
+    """Full S/N analysis of one chromatogram image, UI independent.
+
+    trace is the extraction method (see image_trace); start/end default to the
+    detected plot area. calibrate=True reads the axis tick labels (OCR, cached
+    by content hash): time scale when t0/t1 are not given, and intensity units
+    for the "curve" trace. baseline/noise/blank: see find_main_peak. Returns the same keys as st.session_state.sn_result
+    plus idx_global and width, or None when no peak is found in the zone.
+    """
+    method = trace
+    data = None
+    if calibrate and not hasattr(image, "getbands"):
+        if isinstance(image, str) or hasattr(image, "__fspath__"):
+            with open(image, "rb") as f:
+                data = f.read()
+        else:
+            data = image.read()
+        image = io.BytesIO(data)
+    img = load_image(image, box)
+    trace, (x0, x1) = image_trace(img, method)
+    if data is not None:
+        from labt_cache import content_hash, cached_calibration
+        from labt_ocr import to_intensity
+        cal = cached_calibration(content_hash(data), img, box)
+        if cal and cal["time"] and not t1 > t0:
+            t0, t1 = cal["t0"], cal["t1"]
+        if cal and cal["intensity"] and method == "curve":
+            trace = to_intensity(trace, cal)
+    width = trace.shape[0]
+    if end is None or end > width - 1:
+        end = x1
+    start = x0 if start is None else max(0, int(start))
+    if start >= end:
+        raise ValueError("Start doit être < End")
+
+    peak = find_main_peak(trace, start, int(end), baseline, noise, blank)
+    if peak is None:
+        return None
+    lod_s, loq_s, lod_c, loq_c = lod_loq(peak["noise"], slope)
+    return {
+        "signal": peak["signal"],
+        "noise": peak["noise"],
+        "sn": peak["sn"],
+        "lod_s": lod_s,
+        "loq_s": loq_s,
+        "lod_c": lod_c,
+        "loq_c": loq_c,
+        "rt_text": retention_text(peak["idx_global"], width, t0, t1),
+        "unit": unit,
+        "idx_global": peak["idx_global"],
+        "width": width,
+    }
+
+
+def time_zone(time, t_start=None, t_end=None):
+    """Index range [start, end] of a sorted time axis covering t_start..t_end."""
+    start = 0 if t_start is None else int(np.searchsorted(time, t_start, side="left"))
+    end = len(time) - 1 if t_end is None else int(np.searchsorted(time, t_end, side="right")) - 1
+    return max(0, start), min(len(time) - 1, end)
+
+
+def analyze_signal(time, intensity, t_start=None, t_end=None, slope=None, unit="µg/mL",
+                   baseline=None, noise="std", blank=None):
+    """S/N analysis of a raw (time in minutes, intensity) signal.
+
+    Same result keys as analyze_chromatogram(); retention is the true time of
+    the apex sample; blank is a (t_from, t_to) window in minutes.
+    Returns None when no peak is found.
+    """
+    start, end = time_zone(time, t_start, t_end)
+    if start >= end:
+        raise ValueError("Start doit être < End")
+    if blank is not None:
+        blank = time_zone(time, *blank)
+    peak = find_main_peak(intensity, start, end, baseline, noise, blank)
+    if peak is None:
+        return None
+    lod_s, loq_s, lod_c, loq_c = lod_loq(peak["noise"], slope)
+    return {
+        "signal": peak["signal"],
+        "noise": peak["noise"],
+        "sn": peak["sn"],
+        "lod_s": lod_s,
+        "loq_s": loq_s,
+        "lod_c": lod_c,
+        "loq_c": loq_c,
+        "rt_text": f"{float(time[peak['idx_global']]):.3f} min",
+        "unit": unit,
+        "idx_global": peak["idx_global"],
+        "width": len(intensity),
+    }
+
+
+def decimate_minmax(y, n_out, x=None):
+    """Min/max envelope of y with at most n_out points, for display only.
+
+    Each of n_out/2 equal bins keeps its minimum and maximum in their original
+    order, so peaks and noise extremes survive the reduction.
+    Returns (x, y) of the kept samples (x defaults to the sample index).
+    """
+    y = np.asarray(y)
+    n = y.size
+    if n <= n_out or n_out < 4:
+        return (np.arange(n) if x is None else np.asarray(x)), y
+    n_bins = n_out // 2
+    size = -(-n // n_bins)
+    n_bins = -(-n // size)
+    padded = np.pad(y, (0, n_bins * size - n), mode="edge").reshape(n_bins, size)
+    offsets = np.arange(n_bins) * size
+    i_min = np.minimum(padded.argmin(axis=1) + offsets, n - 1)
+    i_max = np.minimum(padded.argmax(axis=1) + offsets, n - 1)
+    idx = np.empty(2 * n_bins, dtype=np.int64)
+    idx[0::2] = np.minimum(i_min, i_max)
+    idx[1::2] = np.maximum(i_min, i_max)
+    return (idx if x is None else np.asarray(x)[idx]), y[idx]
+
+
+def plot_window(y, start, end, n_out=1500, x=None):
+    """Decimated view of y[start:end+1] (re-run on every zoom change)."""
+    sl = slice(int(start), int(end) + 1)
+    xs = np.arange(sl.start, sl.stop) if x is None else np.asarray(x)[sl]
+    return decimate_minmax(np.asarray(y)[sl], n_out, xs)
+
+
+# -----------------------
+# Linearity: closed-form least squares from (mergeable) sufficient statistics
+# -----------------------
+class LinearAccumulator:
+    """Running n, means and centred co-moments of (x, y), updated chunk by chunk.
+
+    y may hold several signal columns sharing the same x: every column is then
+    fitted at once with matrix products. Non-finite values (blank cells) are
+    masked per column, so each column keeps all of its own points; n and the
+    x moments are then per column too. Chunks are merged with the pairwise
+    (Chan) update, which keeps the fit as accurate as a one-shot solve while
+    using constant memory.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mx = 0.0
+        self.my = 0.0
+        self.sxx = 0.0
+        self.syy = 0.0
+        self.sxy = 0.0
+
+    def add(self, x, y):
+        x = np.asarray(x, dtype=float).ravel()
+        nb = x.size
+        if nb == 0:
+            return self
+        y = np.asarray(y, dtype=float).reshape(nb, -1)
+        valid = np.isfinite(y) & np.isfinite(x)[:, None]
+        if valid.all():
+            mxb, myb = x.mean(), y.mean(axis=0)
+            dx, dy = x - mxb, y - myb
+            sxx_b, syy_b, sxy_b = dx @ dx, np.einsum("ij,ij->j", dy, dy), dx @ dy
+            nb_ = np.full(y.shape[1], nb)
+        else:
+            # masked moments, still one matrix pass for all columns
+            nb_ = valid.sum(axis=0)
+            xm = np.where(valid, x[:, None], 0.0)
+            ym = np.where(valid, y, 0.0)
+            cnt = np.maximum(nb_, 1)
+            mxb, myb = xm.sum(axis=0) / cnt, ym.sum(axis=0) / cnt
+            dx = np.where(valid, xm - mxb, 0.0)
+            dy = np.where(valid, ym - myb, 0.0)
+            sxx_b, syy_b, sxy_b = (np.einsum("ij,ij->j", a, b) for a, b in ((dx, dx), (dy, dy), (dx, dy)))
+        n = self.n + nb_
+        ddx, ddy = mxb - self.mx, myb - self.my
+        # columns without any point yet (n == 0) are left at zero
+        w = np.divide(self.n * nb_, n, out=np.zeros(n.shape), where=n > 0)
+        f = np.divide(nb_, n, out=np.zeros(n.shape), where=n > 0)
+        self.sxx = self.sxx + sxx_b + ddx * ddx * w
+        self.syy = self.syy + syy_b + ddy * ddy * w
+        self.sxy = self.sxy + sxy_b + ddx * ddy * w
+        self.mx = self.mx + ddx * f
+        self.my = self.my + ddy * f
+        self.n = n
+        return self
+
+    def result(self):
+        """Fit of the first (or only) signal column, as floats; ValueError if it cannot be fitted."""
+        fit = self.results([None])[None]
+        if "error" in fit:
+            raise ValueError(fit["error"])
+        return fit
+
+    def results(self, names):
+        """{name: fit} for every signal column (names in column order).
+
+        A column that cannot be fitted gets {"n", "error"} instead of failing the others.
+        """
+        fits = fit_from_moments(self.n, self.mx, self.my, self.sxx, self.syy, self.sxy)
+        errors = np.ravel(fits.pop("error"))
+        out = {}
+        for i, name in enumerate(names):
+            n = int(np.ravel(fits["n"])[i])
+            if errors[i]:
+                out[name] = {"n": n, "error": str(errors[i])}
+            else:
+                out[name] = {k: (int if k == "n" else float)(np.ravel(v)[i]) for k, v in fits.items()}
+        return out
+
+
+def fit_from_moments(n, mx, my, sxx, syy, sxy):
+    """Slope, intercept, R², residual std and standard errors from centred moments.
+
+    Any argument may be an array (one entry per signal column). "error" holds
+    one message per column, "" when it could be fitted; the other entries of a
+    failed column are NaN.
+    """
+    n, mx, my, sxx, syy, sxy = (np.asarray(v) for v in (n, mx, my, sxx, syy, sxy))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = sxy / sxx
+        intercept = my - slope * mx
+        ss_res = np.maximum(syy - slope * sxy, 0.0)
+        r2 = np.where(syy > 0, 1.0 - ss_res / syy, 1.0)
+        dof = n - 2
+        s_res = np.where(dof > 0, np.sqrt(ss_res / np.maximum(dof, 1)), np.nan)
+        se_slope = s_res / np.sqrt(sxx)
+        se_intercept = s_res * np.sqrt(1.0 / n + mx * mx / sxx)
+    few = (n < 2) | (sxx == 0)
+    finite = np.isfinite(slope) & np.isfinite(intercept) & np.isfinite(syy)
+    error = np.where(few, "Nombres invalides ou insuffisants",
+                     np.where(finite, "", "Valeurs non numériques dans les données"))
+    ok = error == ""
+    fits = {"slope": slope, "intercept": intercept, "r2": r2, "n": n,
+            "s_res": s_res, "se_slope": se_slope, "se_intercept": se_intercept}
+    fits = {k: v if k == "n" else np.where(ok, v, np.nan) for k, v in fits.items()}
+    fits["error"] = error
+    return fits
+
+
+def linear_fit(x, y):
+    """In-memory fit; same keys as LinearAccumulator.result() plus residuals."""
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    if x.size != y.size:
+        raise ValueError(f"Concentrations ({x.size}) et signaux ({y.size}) de longueurs différentes")
+    res = LinearAccumulator().add(x, y).result()
+    res["residuals"] = y - (res["slope"] * x + res["intercept"])
+    return res
+
+
+def _numeric(frame):
+    """Float values of a CSV chunk; non-numeric cells become NaN (masked by the fit)."""
+    import pandas as pd
+    try:
+        return frame.astype(float).values
+    except ValueError:
+        return frame.apply(pd.to_numeric, errors="coerce").values.astype(float)
+
+
+def linear_fit_csv(src, chunk_rows=200_000, preview_rows=1000):
+    """Stream a (concentration, signal, ...) CSV in chunks and fit the first two columns.
+
+    Memory stays bounded by chunk_rows. Rows with a missing or non-numeric
+    value are dropped. Returns (fit, preview DataFrame of the first
+    preview_rows rows with their residuals).
+    """
+    import pandas as pd
+    acc = LinearAccumulator()
+    preview = None
+    for chunk in pd.read_csv(src, chunksize=chunk_rows):
+        if chunk.shape[1] < 2:
+            raise ValueError("Le CSV doit contenir au moins deux colonnes (concentration, signal).")
+        if preview is None:
+            preview = chunk.head(preview_rows)
+        xy = _numeric(chunk.iloc[:, :2])
+        acc.add(xy[:, 0], xy[:, 1])
+    if preview is None:
+        raise ValueError("CSV vide")
+    fit = acc.result()
+    preview = preview.copy()
+    xy = _numeric(preview.iloc[:, :2])
+    preview["residual"] = xy[:, 1] - (fit["slope"] * xy[:, 0] + fit["intercept"])
+    return fit, preview
+
+
+def linear_fit_multi_csv(src, chunk_rows=200_000, preview_rows=1000):
+    """Fit every signal column of a (concentration, signal_1, ..., signal_k) CSV.
+
+    One matrix pass per chunk for all columns. A missing or non-numeric value
+    only drops that point from its own column (replicate series may differ in
+    length), and a column that cannot be fitted gets {"n", "error"} while the
+    others are fitted. Returns ({column name: fit}, preview DataFrame);
+    ValueError if no column could be fitted.
+    """
+    import pandas as pd
+    acc = LinearAccumulator()
+    preview = names = None
+    for chunk in pd.read_csv(src, chunksize=chunk_rows):
+        if chunk.shape[1] < 2:
+            raise ValueError("Le CSV doit contenir au moins deux colonnes (concentration, signal).")
+        if preview is None:
+            preview = chunk.head(preview_rows)
+            names = [str(c) for c in chunk.columns[1:]]
+        vals = _numeric(chunk)
+        acc.add(vals[:, 0], vals[:, 1:])
+    if preview is None:
+        raise ValueError("CSV vide")
+    fits = acc.results(names)
+    if all("error" in fit for fit in fits.values()):
+        raise ValueError(next(iter(fits.values()))["error"])
+    return fits, preview
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# Cold-start import profile of the app (what the login page pays for)
+#   python labt_importprof.py               # top imports + heavy-module check
+#   python labt_importprof.py --budget-ms 1500
+# Exit code 1 if a heavy dependency is imported at startup or the budget is exceeded.
+# -----------------------
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# must only be imported by linearity_module(), sn_module() or generate_pdf()
+# (PyMuPDF is imported as pymupdf, older code used fitz; labt_pages/labt_report pull them in)
+HEAVY_MODULES = ["pandas", "scipy", "sklearn", "fpdf", "PIL.ImageDraw", "PIL.ImageFont", "cv2", "fitz", "pymupdf",
+                 "pdf2image", "pytesseract", "labt_pages", "labt_report"]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_profile(module="app"):
+    """[(cumulative_us, self_us, name)] from `python -X importtime`, slowest first."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=HERE, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        # nesting is encoded by the indentation after the single separator space
+        rows.append((int(cum_us), int(self_us), name[1:].rstrip()))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    return sorted(rows, reverse=True)
+
+
+def heavy_loaded(module="app"):
+    code = (f"import sys, json; import {module}; "
+            f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="LabT cold-start import profile")
+    ap.add_argument("--module", default="app")
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--budget-ms", type=float, default=None, help="fail if the total import time exceeds this")
+    args = ap.parse_args(argv)
+
+    rows = import_profile(args.module)
+    top_level = [r for r in rows if not r[2].startswith(" ")]
+    total_ms = sum(r[0] for r in top_level) / 1000.0
+    print(f"import {args.module}: {total_ms:.0f} ms total")
+    for cum, own, name in rows[:args.top]:
+        print(f"  {cum/1000:8.1f} ms  (self {own/1000:6.1f})  {name.strip()}")
+
+    status = 0
+    heavy = heavy_loaded(args.module)
+    if heavy:
+        print(f"heavy modules imported at startup: {', '.join(heavy)}")
+        status = 1
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"over budget: {total_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
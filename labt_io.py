@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# Raw detector signal readers: ANDI/AIA netCDF (.cdf) and CSV (time, intensity)
+# Both return (time_minutes, intensity) as 1-D float arrays.
+# -----------------------
+import io
+import os
+import warnings
+
+import numpy as np
+
+SIGNAL_EXTS = (".cdf", ".nc", ".csv", ".txt")
+
+
+def _is_number(s):
+    try:
+        float(s)
+        return True
+    except ValueError:
+        return False
+
+
+def _sniff(line):
+    """Delimiter of a CSV line (None = whitespace)."""
+    for d in (";", "\t", ","):
+        if d in line:
+            return d
+    return None
+
+
+def read_signal_csv(src):
+    """CSV/TXT with time (minutes) and intensity columns; one column = intensity only.
+
+    Parsed by NumPy's C reader straight from the stream, one float64 array,
+    no DataFrame. A header line is skipped; ';' files may use a decimal comma.
+    """
+    if isinstance(src, (bytes, bytearray)):
+        f = io.StringIO(bytes(src).decode("utf-8", errors="replace"))
+    elif isinstance(src, (str, os.PathLike)):
+        f = open(src, "r", encoding="utf-8", errors="replace")
+    else:
+        f = io.TextIOWrapper(src, encoding="utf-8", errors="replace")
+    try:
+        first = f.readline()
+        while first and not first.strip():
+            first = f.readline()
+        delim = _sniff(first)
+        fields = first.strip().split(delim)
+        usecols = (0, 1) if len(fields) >= 2 else (0,)
+        has_header = not all(_is_number(v.replace(",", ".") if delim == ";" else v) for v in fields[:len(usecols)])
+        if has_header:
+            first = f.readline()
+        decimal_comma = delim == ";" and "," in first
+        conv = (lambda s: float(s.replace(",", "."))) if decimal_comma else None
+        lines = _chain(first, f)
+        data = np.loadtxt(lines, delimiter=delim, usecols=usecols, ndmin=2, converters=conv, dtype=float)
+    finally:
+        if isinstance(src, (str, os.PathLike)):
+            f.close()
+        elif not isinstance(src, (bytes, bytearray)):
+            f.detach()
+    if data.shape[1] == 1:
+        y = data[:, 0]
+        return np.arange(y.size, dtype=float), y
+    return data[:, 0].copy(), data[:, 1].copy()
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def read_signal_cdf(src):
+    """ANDI/AIA chromatography netCDF: ordinate_values + sampling interval (s).
+
+    Paths are memory-mapped (no intermediate read buffer); samples are
+    converted to float64 once.
+    """
+    from scipy.io import netcdf_file
+    if isinstance(src, (bytes, bytearray)):
+        src = io.BytesIO(src)
+    use_mmap = isinstance(src, (str, os.PathLike))
+    with warnings.catch_warnings():
+        # arrays below are copies, the mmap is released when the variables are collected
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return _read_cdf(netcdf_file(src, "r", mmap=use_mmap))
+
+
+def _read_cdf(nc):
+    with nc:
+        v = nc.variables
+        y = np.array(v["ordinate_values"][:], dtype=float)
+        if "raw_data_retention" in v and v["raw_data_retention"].shape[0] == y.size:
+            t_sec = np.array(v["raw_data_retention"][:], dtype=float)
+        else:
+            dt = float(v["actual_sampling_interval"].getValue()) if "actual_sampling_interval" in v else 1.0
+            t_delay = float(v["actual_delay_time"].getValue()) if "actual_delay_time" in v else 0.0
+            t_sec = t_delay + dt * np.arange(y.size, dtype=float)
+    return t_sec / 60.0, y
+
+
+def load_signal(src, name=None):
+    """Dispatch on file extension (name, or src when it is a path)."""
+    name = (name or (src if isinstance(src, str) else "")).lower()
+    if name.endswith((".cdf", ".nc")):
+        return read_signal_cdf(src)
+    return read_signal_csv(src)
+
+
+def load_signal_mmap(path):
+    """Parse a signal file once, then memory-map its .npy sidecar on later runs."""
+    npy = path + ".npy"
+    if os.path.exists(npy) and os.path.getmtime(npy) >= os.path.getmtime(path):
+        arr = np.load(npy, mmap_mode="r")
+        return arr[0], arr[1]
+    t, y = load_signal(path)
+    try:
+        np.save(npy, np.vstack([t, y]))
+    except OSError:
+        pass
+    return t, y
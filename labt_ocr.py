@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# Axis calibration from the tick labels of a chromatogram image (tesseract OCR)
+# OCR only reads two thin strips: below the x-axis (time) and left of the
+# y-axis (intensity), located with labt_core.plot_area. pytesseract is imported
+# lazily; without it (or without the tesseract binary) calibration is None.
+# -----------------------
+import re
+
+import numpy as np
+
+from labt_core import plot_area
+from labt_timing import span
+
+# digits only: tick labels, no words
+OCR_CONFIG = "--psm 11 -c tessedit_char_whitelist=0123456789.,-"
+OCR_SCALE = 3          # strips are upscaled: tesseract wants ~30 px text
+X_STRIP = 60           # rows read below the x-axis
+Y_STRIP = 140          # columns read left of the y-axis
+MIN_CONF = 30
+
+_NUMBER = re.compile(r"^-?\d+(?:[.,]\d+)?$")
+_available = None
+
+
+def ocr_available():
+    """True when pytesseract and the tesseract binary can be used (checked once)."""
+    global _available
+    if _available is None:
+        try:
+            import pytesseract
+            pytesseract.get_tesseract_version()
+            _available = True
+        except Exception:
+            _available = False
+    return _available
+
+
+def read_numbers(strip):
+    """Numeric words of a PIL strip as [(x_center, y_center, value)] in strip pixels."""
+    import pytesseract
+    from PIL import Image
+    big = strip.convert("L").resize((strip.width * OCR_SCALE, strip.height * OCR_SCALE), Image.LANCZOS)
+    d = pytesseract.image_to_data(big, config=OCR_CONFIG, output_type=pytesseract.Output.DICT)
+    out = []
+    for text, conf, left, top, width, height in zip(d["text"], d["conf"], d["left"], d["top"], d["width"], d["height"]):
+        text = text.strip()
+        if not _NUMBER.match(text) or float(conf) < MIN_CONF:
+            continue
+        out.append(((left + width / 2.0) / OCR_SCALE, (top + height / 2.0) / OCR_SCALE, float(text.replace(",", "."))))
+    return out
+
+
+def fit_axis(pos, val, tol=0.02):
+    """Robust value = slope * pos + intercept from tick labels.
+
+    Median of pairwise slopes, then least squares on the labels within tol x
+    the value range. Returns {"slope", "intercept", "n"} or None.
+    """
+    pos = np.asarray(pos, dtype=float)
+    val = np.asarray(val, dtype=float)
+    if pos.size < 2:
+        return None
+    i, j = np.triu_indices(pos.size, 1)
+    ok = pos[j] != pos[i]
+    if not ok.any():
+        return None
+    slope = float(np.median((val[j] - val[i])[ok] / (pos[j] - pos[i])[ok]))
+    intercept = float(np.median(val - slope * pos))
+    span_ = max(float(np.ptp(val)), 1e-12)
+    inl = np.abs(val - (slope * pos + intercept)) <= tol * span_
+    if inl.sum() < 2 or np.ptp(pos[inl]) == 0:
+        return None
+    slope, intercept = np.polyfit(pos[inl], val[inl], 1)
+    return {"slope": float(slope), "intercept": float(intercept), "n": int(inl.sum())}
+
+
+def calibrate_axes(img, reader=read_numbers):
+    """Time (column -> minutes) and intensity (row -> value) maps read from the axes.
+
+    Returns {"time": fit or None, "intensity": fit or None, "axis_row": row of
+    the x-axis, "t0", "t1": minutes at the first/last column (for
+    pixel_to_minutes)}, or None when OCR is not available.
+    """
+    if reader is read_numbers and not ocr_available():
+        return None
+    with span("ocr.axes"):
+        gray = np.asarray(img.convert("L"))
+        h, w = gray.shape
+        top, bottom, left, right = plot_area(gray)[:4]
+
+        # x labels: centred under their tick, so their x is the tick column
+        time_fit = None
+        if bottom < h - 5:
+            x_lo = max(0, left - 40)
+            words = reader(img.crop((x_lo, bottom + 2, min(w, right + 40), min(h, bottom + X_STRIP))))
+            time_fit = fit_axis([x_lo + x for x, _, _ in words], [v for _, _, v in words])
+            if time_fit and time_fit["slope"] <= 0:
+                time_fit = None
+
+        # y labels: vertically centred on their tick, values grow upwards
+        int_fit = None
+        if left > 5:
+            y_lo = max(0, top - 10)
+            words = reader(img.crop((max(0, left - Y_STRIP), y_lo, left - 2, min(h, bottom + 10))))
+            int_fit = fit_axis([y_lo + y for _, y, _ in words], [v for _, _, v in words])
+            if int_fit and int_fit["slope"] >= 0:
+                int_fit = None
+
+    cal = {"time": time_fit, "intensity": int_fit, "axis_row": int(bottom), "t0": None, "t1": None}
+    if time_fit:
+        cal["t0"] = time_fit["intercept"]
+        cal["t1"] = time_fit["slope"] * (w - 1) + time_fit["intercept"]
+    return cal
+
+
+def to_intensity(trace, cal):
+    """Curve heights (pixels above the x-axis, see extract_curve) -> intensity units."""
+    fit = (cal or {}).get("intensity")
+    if not fit:
+        return trace
+    return fit["slope"] * (cal["axis_row"] - np.asarray(trace, dtype=float)) + fit["intercept"]
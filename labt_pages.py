@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# Multi-page PDF reports (one chromatogram per page): lazy page rendering and
+# per-page S/N in worker processes, results yielded as pages finish.
+# PyMuPDF renders the pages (pdf2image/poppler as fallback); each worker opens
+# the file and rasterizes only its own page.
+# -----------------------
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from labt_timing import span
+
+PDF_DPI = int(os.environ.get("LABT_PDF_DPI", "150"))
+PDF_WORKERS = int(os.environ.get("LABT_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PREVIEW_WIDTH = 1200   # preview PNG sent back with each page result
+# uploads spilled to disk for the workers: one directory, pruned by age and total size
+SPILL_DIR = os.environ.get("LABT_SPILL_DIR") or os.path.join(tempfile.gettempdir(), "labt_spill")
+SPILL_MAX_BYTES = int(os.environ.get("LABT_SPILL_MB", "1024")) * 1024 * 1024
+SPILL_MAX_AGE = float(os.environ.get("LABT_SPILL_HOURS", "24")) * 3600
+SPILL_GRACE = 600      # seconds: a file used this recently is never pruned for size
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def page_count(path):
+    _touch(path)
+    try:
+        import pymupdf
+    except ImportError:
+        from pdf2image import pdfinfo_from_path
+        return int(pdfinfo_from_path(path)["Pages"])
+    with pymupdf.open(path) as doc:
+        return doc.page_count
+
+
+def render_page(path, page_no, dpi=PDF_DPI):
+    """Page page_no (0-based) as an RGB PIL image; the other pages are not rasterized."""
+    from PIL import Image
+    _touch(path)
+    with span("pdf.render"):
+        try:
+            import pymupdf
+        except ImportError:
+            from pdf2image import convert_from_path
+            return convert_from_path(path, dpi=dpi, first_page=page_no + 1, last_page=page_no + 1)[0].convert("RGB")
+        with pymupdf.open(path) as doc:
+            pix = doc[page_no].get_pixmap(dpi=dpi, alpha=False)
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+
+def preview_png(img, width=PREVIEW_WIDTH):
+    """(PNG bytes of img reduced to at most width columns, reduction factor)."""
+    factor = -(-img.width // width)
+    prev = img.reduce(factor) if factor > 1 else img
+    buf = io.BytesIO()
+    prev.save(buf, "PNG")
+    return buf.getvalue(), factor
+
+
+def analyze_page(path, page_no, dpi=PDF_DPI, params=None):
+    """S/N of one page (runs in a worker): analyze_chromatogram keys + page,
+    box, seconds, error, and a reduced PNG preview (preview, preview_factor).
+
+    The page is cropped to params["box"] (page pixels at dpi) or else to the
+    chart found by labt_core.chart_box; pixel positions and the preview are
+    relative to that box. A page without a detectable chart is an error.
+    """
+    from labt_core import analyze_chromatogram, chart_box
+    params = dict(params or {})
+    calibrate = params.pop("calibrate", False)
+    box = params.pop("box", None)
+    row = {"page": page_no + 1}
+    t0 = time.perf_counter()
+    try:
+        img = render_page(path, page_no, dpi)
+        box = tuple(int(v) for v in box) if box else chart_box(img)
+        if box is None:
+            raise ValueError("no chart found on the page (give its box)")
+        img = img.crop(box)
+        row["box"] = list(box)
+        if calibrate:
+            # OCR calibration is cached by content hash: hash the rendered page
+            buf = io.BytesIO()
+            img.save(buf, "PNG", compress_level=1)
+            buf.seek(0)
+            res = analyze_chromatogram(buf, calibrate=True, **params)
+        else:
+            res = analyze_chromatogram(img, **params)
+        if res is None:
+            row["error"] = "no peak"
+        else:
+            row.update(res)
+        row["preview"], row["preview_factor"] = preview_png(img)
+    except Exception as e:
+        row["error"] = str(e)
+    row["seconds"] = time.perf_counter() - t0
+    return row
+
+
+def pool():
+    """Process pool shared by all sessions (spawned: the server process is threaded)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _POOL
+
+
+def iter_pages(path, dpi=PDF_DPI, params=None, pages=None, executor=None):
+    """Yield analyze_page() rows in completion order.
+
+    Pages still queued are cancelled when the caller stops iterating
+    (e.g. a Streamlit rerun interrupts the loop).
+    """
+    global _POOL
+    pages = range(page_count(path)) if pages is None else pages
+    ex = executor or pool()
+    futures = [ex.submit(analyze_page, path, p, dpi, params) for p in pages]
+    try:
+        for f in as_completed(futures):
+            yield f.result()
+    except BrokenProcessPool:
+        with _POOL_LOCK:
+            if _POOL is ex:
+                _POOL = None
+        raise
+    finally:
+        for f in futures:
+            f.cancel()
+
+
+# -----------------------
+# Spill directory
+# -----------------------
+def _touch(path):
+    """Mark a spilled file as in use (files outside SPILL_DIR are left alone)."""
+    if os.path.dirname(os.path.abspath(path)) == os.path.abspath(SPILL_DIR):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+
+def prune_spill(keep=None):
+    """Delete spilled files older than SPILL_MAX_AGE, then the least recently used
+    ones until the directory fits SPILL_MAX_BYTES (files used within SPILL_GRACE
+    and keep are spared)."""
+    now = time.time()
+    try:
+        entries = [e for e in os.scandir(SPILL_DIR) if e.is_file()]
+    except FileNotFoundError:
+        return
+    files = []
+    for e in entries:
+        try:
+            st = e.stat()
+        except FileNotFoundError:
+            continue
+        if now - st.st_mtime > SPILL_MAX_AGE and e.path != keep:
+            discard_spill(e.path)
+        else:
+            files.append((st.st_mtime, st.st_size, e.path))
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in sorted(files):
+        if total <= SPILL_MAX_BYTES:
+            break
+        if path != keep and now - mtime > SPILL_GRACE:
+            discard_spill(path)
+            total -= size
+
+
+def discard_spill(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def spill_path(digest, suffix=".pdf"):
+    return os.path.join(SPILL_DIR, f"{digest}{suffix}")
+
+
+def spill_upload(data, digest, suffix=".pdf"):
+    """Write upload bytes once to SPILL_DIR under their content hash (workers need a path)."""
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    path = spill_path(digest, suffix)
+    if os.path.exists(path):
+        _touch(path)
+        return path
+    fd, tmp = tempfile.mkstemp(prefix=".", suffix=suffix, dir=SPILL_DIR)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    prune_spill(keep=path)
+    return path
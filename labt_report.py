@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# PDF reports (no Streamlit): single-analysis report, combined batch report,
+# and a small worker pool so rendering never blocks the Streamlit script thread.
+#   python labt_report.py --user alice --from 2026-01-01 -o campaign.pdf
+# -----------------------
+import argparse
+import contextvars
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from labt_timing import span
+
+REPORT_WORKERS = int(os.environ.get("LABT_REPORT_WORKERS", "2"))
+_EXECUTOR = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="labt-report")
+
+
+def _new_pdf(title):
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.cell(0, 10, title, align="C", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", "", 12)
+    return pdf
+
+
+def _line(pdf, text, h=8):
+    # core fonts are latin-1 only
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    pdf.cell(0, h, text, new_x="LMARGIN", new_y="NEXT")
+
+
+def _fmt(v, spec=".6g"):
+    return "N/A" if v is None else format(v, spec)
+
+
+def _lin_section(pdf, slope, intercept, fits=None):
+    if slope is not None:
+        _line(pdf, f"Slope: {slope:.6g}   Intercept: {intercept:.6g}")
+    else:
+        _line(pdf, "Slope: N/A")
+    for name, fit in (fits or {}).items():
+        if "error" in fit:
+            _line(pdf, f"{name}: {fit['error']}")
+            continue
+        _line(pdf, f"{name}: slope {fit['slope']:.6g}  intercept {fit['intercept']:.6g}  R2 {fit['r2']:.5f}")
+
+
+def _sn_section(pdf, snr):
+    _line(pdf, f"S/N: {snr.get('sn', 'N/A')}")
+    _line(pdf, f"Signal H: {snr.get('signal', 'N/A')}")
+    if snr.get("noise_method") == "p2p":
+        _line(pdf, f"Noise h/2 (peak-to-peak / 2): {snr.get('noise', 'N/A')}")
+    else:
+        _line(pdf, f"Noise h: {snr.get('noise', 'N/A')}")
+    if snr.get("lod_s") is not None:
+        _line(pdf, f"LOD signal: {snr.get('lod_s'):.6g}")
+        _line(pdf, f"LOQ signal: {snr.get('loq_s'):.6g}")
+    if snr.get("lod_c") is not None:
+        _line(pdf, f"LOD conc: {snr.get('lod_c'):.6g} {snr.get('unit')}")
+        _line(pdf, f"LOQ conc: {snr.get('loq_c'):.6g} {snr.get('unit')}")
+    if snr.get("rt_text"):
+        _line(pdf, f"Retention: {snr.get('rt_text')}")
+    if snr.get("analyte"):
+        _line(pdf, f"Analyte: {snr.get('analyte')}")
+
+
+def _output(pdf):
+    out = pdf.output()
+    # fpdf2 returns a bytearray, legacy PyFPDF a latin-1 str
+    return out.encode("latin1") if isinstance(out, str) else bytes(out)
+
+
+def build_report(lin_slope, lin_intercept, lin_fits, sn_result, image=None):
+    """Report of the current session results; image is a PIL image, PNG bytes,
+    or a callable returning either (called here, in the report worker).
+
+    The image is embedded from memory (no temp file, no PNG re-encode for PIL).
+    """
+    with span("pdf.layout"):
+        pdf = _new_pdf("LabT Report")
+        _lin_section(pdf, lin_slope, lin_intercept, lin_fits)
+        if sn_result:
+            _sn_section(pdf, sn_result)
+    if image is not None:
+        with span("pdf.image"):
+            try:
+                if callable(image):
+                    image = image()
+                pdf.image(io.BytesIO(image) if isinstance(image, (bytes, bytearray)) else image, x=10, w=180)
+            except Exception as e:
+                _line(pdf, f"Image not available: {e}")
+    with span("pdf.output"):
+        return _output(pdf)
+
+
+def build_batch_report(sn_rows, lin_rows, title="LabT Batch Report"):
+    """One combined PDF for many stored results (rows from labt_store.history)."""
+    with span("pdf.batch"):
+        return _build_batch_report(sn_rows, lin_rows, title)
+
+
+def _build_batch_report(sn_rows, lin_rows, title):
+    pdf = _new_pdf(title)
+    pdf.set_font("Helvetica", "", 9)
+    _line(pdf, f"{datetime.now():%Y-%m-%d %H:%M}  -  {len(lin_rows)} linearity, {len(sn_rows)} S/N results", h=6)
+
+    if lin_rows:
+        pdf.set_font("Helvetica", "B", 12)
+        _line(pdf, "Linearity")
+        pdf.set_font("Helvetica", "", 9)
+        for r in lin_rows:
+            _line(pdf, f"{r['created_at']}  {r['user']}  {r['analyte'] or '-'}  slope {_fmt(r['slope'])}  "
+                       f"intercept {_fmt(r['intercept'])}  R2 {_fmt(r['r2'], '.5f')}  n {r['n']}", h=5)
+
+    if sn_rows:
+        pdf.set_font("Helvetica", "B", 12)
+        _line(pdf, "Signal / Noise")
+        pdf.set_font("Helvetica", "", 9)
+        for r in sn_rows:
+            lod = f"  LOD {_fmt(r['lod_c'])} / LOQ {_fmt(r['loq_c'])} {r['unit']}" if r.get("lod_c") is not None else ""
+            _line(pdf, f"{r['created_at']}  {r['user']}  {r['analyte'] or '-'}  {r['image_hash'][:10]}  "
+                       f"S/N {_fmt(r['sn'], '.3f')}  H {_fmt(r['signal'])}  h {_fmt(r['noise'])}  "
+                       f"RT {r['rt_text'] or '-'}{lod}", h=5)
+    return _output(pdf)
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def submit(fn, *args):
+    """Run a report builder in the worker pool; the future yields (pdf_bytes, seconds).
+
+    The caller's context is carried over so timing spans land in its session.
+    """
+    return _EXECUTOR.submit(contextvars.copy_context().run, _timed, fn, *args)
+
+
+def main(argv=None):
+    from labt_store import history
+    ap = argparse.ArgumentParser(description="LabT combined PDF of stored results")
+    ap.add_argument("-o", "--out", default="LabT_Batch_Report.pdf")
+    ap.add_argument("--db", default=None, help="result store (default: LABT_DB or labt_results.db)")
+    ap.add_argument("--user", default=None)
+    ap.add_argument("--analyte", default=None)
+    ap.add_argument("--from", dest="date_from", default=None, help="YYYY-MM-DD")
+    ap.add_argument("--to", dest="date_to", default=None, help="YYYY-MM-DD (exclusive)")
+    ap.add_argument("--limit", type=int, default=10000)
+    args = ap.parse_args(argv)
+
+    filters = dict(user=args.user, analyte=args.analyte, date_from=args.date_from, date_to=args.date_to,
+                   limit=args.limit, path=args.db)
+    (data, secs) = _timed(build_batch_report, history("sn", **filters), history("lin", **filters))
+    with open(args.out, "wb") as f:
+        f.write(data)
+    print(f"{args.out}: {len(data)} bytes in {secs:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# Dependency-tracked pipeline stages (no Streamlit)
+# Each named stage keeps its last result together with a token of its inputs;
+# it is re-run only when that token changes, and its own token is passed on to
+# the stages that depend on it:
+#   trace, t_tok = stages.run("sn.trace", lambda: ..., img_hash, method, box)
+#   found, p_tok = stages.run("sn.peak", lambda: locate_peak(trace, s, e), t_tok, s, e)
+# -----------------------
+import hashlib
+
+from labt_timing import span
+
+
+def token(name, inputs):
+    """Token of a stage: its name plus the repr of its inputs (upstream tokens or small parameters)."""
+    return hashlib.blake2b(repr((name,) + tuple(inputs)).encode(), digest_size=12).hexdigest()
+
+
+class Stages:
+    """Last value of each stage, recomputed only when its inputs change.
+
+    Inputs are hashed through repr(): pass upstream tokens, hashes and scalar
+    parameters, never arrays (pass the token of the stage that produced them).
+    One slot per stage name, so memory stays bounded by the number of stages.
+    """
+
+    def __init__(self):
+        self._memo = {}
+        self.runs = {}      # stage -> number of computations (not cache hits)
+
+    def run(self, name, fn, *inputs):
+        """(value, token): fn() when the inputs changed since the last call, else the kept value."""
+        tok = token(name, inputs)
+        hit = self._memo.get(name)
+        if hit is not None and hit[0] == tok:
+            return hit[1], tok
+        with span(name):
+            value = fn()
+        self._memo[name] = (tok, value)
+        self.runs[name] = self.runs.get(name, 0) + 1
+        return value, tok
+
+    def lazy(self, name, fn, *inputs):
+        """(thunk, token): like run(), but the stage only runs when thunk() is called."""
+        return (lambda: self.run(name, fn, *inputs)[0]), token(name, inputs)
+
+    def get(self, name, default=None):
+        hit = self._memo.get(name)
+        return default if hit is None else hit[1]
+
+    def clear(self):
+        self._memo.clear()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# Persistent SQLite store of S/N and linearity results (history + result cache)
+# One table per analysis type, indexed by user, date, analyte and content hash.
+# -----------------------
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+DB_FILE = os.environ.get("LABT_DB", "labt_results.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sn_results (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    analyte TEXT NOT NULL DEFAULT '',
+    image_hash TEXT NOT NULL,
+    params_key TEXT NOT NULL,
+    source TEXT,
+    signal REAL, noise REAL, sn REAL,
+    lod_s REAL, loq_s REAL, lod_c REAL, loq_c REAL,
+    rt_text TEXT, unit TEXT,
+    idx_global INTEGER, width INTEGER,
+    UNIQUE (user, image_hash, params_key, analyte)
+);
+CREATE INDEX IF NOT EXISTS ix_sn_date ON sn_results (created_at);
+CREATE INDEX IF NOT EXISTS ix_sn_user_date ON sn_results (user, created_at);
+CREATE INDEX IF NOT EXISTS ix_sn_analyte ON sn_results (analyte, created_at);
+CREATE INDEX IF NOT EXISTS ix_sn_hash ON sn_results (image_hash, params_key);
+
+CREATE TABLE IF NOT EXISTS lin_results (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    analyte TEXT NOT NULL DEFAULT '',
+    data_hash TEXT NOT NULL,
+    slope REAL, intercept REAL, r2 REAL, n INTEGER,
+    s_res REAL, se_slope REAL, se_intercept REAL,
+    UNIQUE (user, data_hash, analyte)
+);
+CREATE INDEX IF NOT EXISTS ix_lin_date ON lin_results (created_at);
+CREATE INDEX IF NOT EXISTS ix_lin_user_date ON lin_results (user, created_at);
+CREATE INDEX IF NOT EXISTS ix_lin_analyte ON lin_results (analyte, created_at);
+CREATE INDEX IF NOT EXISTS ix_lin_hash ON lin_results (data_hash);
+
+CREATE TABLE IF NOT EXISTS axis_calibrations (
+    image_hash TEXT NOT NULL,
+    params_key TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    calibration TEXT NOT NULL,
+    PRIMARY KEY (image_hash, params_key)
+);
+"""
+
+SN_FIELDS = ["signal", "noise", "sn", "lod_s", "loq_s", "lod_c", "loq_c", "rt_text", "unit", "idx_global", "width"]
+LIN_FIELDS = ["slope", "intercept", "r2", "n", "s_res", "se_slope", "se_intercept"]
+TABLES = {"sn": "sn_results", "lin": "lin_results"}
+
+_local = threading.local()
+
+
+def connect(path=None):
+    """Per-thread connection (Streamlit serves sessions from several threads)."""
+    path = path or DB_FILE
+    conns = _local.__dict__.setdefault("conns", {})
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conns[path] = conn
+    return conn
+
+
+def params_key(params):
+    """Canonical text of the parameters that determine a result (e.g. the zone)."""
+    return json.dumps({k: (round(v, 6) if isinstance(v, float) else v) for k, v in sorted(params.items())})
+
+
+def _num(v):
+    # NumPy scalars / NaN -> plain Python values SQLite understands
+    if v is None:
+        return None
+    if isinstance(v, str):
+        return v
+    v = v.item() if hasattr(v, "item") else v
+    return None if isinstance(v, float) and v != v else v
+
+
+def lookup_sn(image_hash, params, path=None):
+    """Stored S/N result for this content and zone (any user), or None."""
+    row = connect(path).execute(
+        "SELECT * FROM sn_results WHERE image_hash = ? AND params_key = ? ORDER BY created_at DESC LIMIT 1",
+        (image_hash, params_key(params))).fetchone()
+    return dict(row) if row else None
+
+
+def save_sn(user, image_hash, params, result, analyte=None, source="image", path=None):
+    """Insert or refresh the user's result for this content/zone/analyte."""
+    vals = [_num(result.get(k)) for k in SN_FIELDS]
+    conn = connect(path)
+    with conn:
+        conn.execute(
+            f"INSERT INTO sn_results (user, created_at, analyte, image_hash, params_key, source, {', '.join(SN_FIELDS)}) "
+            f"VALUES (?, ?, ?, ?, ?, ?, {', '.join('?' * len(SN_FIELDS))}) "
+            f"ON CONFLICT (user, image_hash, params_key, analyte) DO UPDATE SET created_at = excluded.created_at, "
+            + ", ".join(f"{k} = excluded.{k}" for k in SN_FIELDS),
+            [user, datetime.now().isoformat(timespec="seconds"), analyte or "", image_hash, params_key(params), source] + vals)
+
+
+def lookup_lin(data_hash, path=None):
+    """{analyte: fit} stored for this calibration data (any user), or None."""
+    rows = connect(path).execute(
+        f"SELECT analyte, {', '.join(LIN_FIELDS)} FROM lin_results WHERE data_hash = ? ORDER BY id", (data_hash,)).fetchall()
+    if not rows:
+        return None
+    return {r["analyte"]: {k: r[k] for k in LIN_FIELDS} for r in rows}
+
+
+def save_lin(user, data_hash, fits, path=None):
+    """Store {analyte: fit} for one calibration upload ('' for a single curve)."""
+    now = datetime.now().isoformat(timespec="seconds")
+    conn = connect(path)
+    with conn:
+        conn.executemany(
+            f"INSERT INTO lin_results (user, created_at, analyte, data_hash, {', '.join(LIN_FIELDS)}) "
+            f"VALUES (?, ?, ?, ?, {', '.join('?' * len(LIN_FIELDS))}) "
+            f"ON CONFLICT (user, data_hash, analyte) DO UPDATE SET created_at = excluded.created_at, "
+            + ", ".join(f"{k} = excluded.{k}" for k in LIN_FIELDS),
+            [[user, now, analyte or "", data_hash] + [_num(fit.get(k)) for k in LIN_FIELDS]
+             for analyte, fit in fits.items()])
+
+
+def lookup_calibration(image_hash, params, path=None):
+    """Stored OCR axis calibration of this image (and crop), or None."""
+    row = connect(path).execute(
+        "SELECT calibration FROM axis_calibrations WHERE image_hash = ? AND params_key = ?",
+        (image_hash, params_key(params))).fetchone()
+    return json.loads(row["calibration"]) if row else None
+
+
+def save_calibration(image_hash, params, calibration, path=None):
+    conn = connect(path)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO axis_calibrations (image_hash, params_key, created_at, calibration) VALUES (?, ?, ?, ?)",
+            (image_hash, params_key(params), datetime.now().isoformat(timespec="seconds"), json.dumps(calibration)))
+
+
+def history(kind, user=None, analyte=None, date_from=None, date_to=None, image_hash=None, limit=1000, path=None):
+    """Latest results of one kind ('sn' or 'lin') matching the filters, newest first."""
+    table = TABLES[kind]
+    where, args = [], []
+    if user:
+        where.append("user = ?")
+        args.append(user)
+    if analyte:
+        where.append("analyte = ?")
+        args.append(analyte)
+    if date_from:
+        where.append("created_at >= ?")
+        args.append(str(date_from))
+    if date_to:
+        where.append("created_at < ?")
+        args.append(str(date_to))
+    if image_hash:
+        where.append(("image_hash" if kind == "sn" else "data_hash") + " = ?")
+        args.append(image_hash)
+    sql = f"SELECT * FROM {table}" + (f" WHERE {' AND '.join(where)}" if where else "")
+    sql += " ORDER BY created_at DESC LIMIT ?"
+    rows = connect(path).execute(sql, args + [int(limit)]).fetchall()
+    return [dict(r) for r in rows]
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# Lightweight timing spans for the hot paths (decode, trace, peaks, annotation, PDF)
+# Aggregated per process and per session; exported as JSON or Prometheus text.
+# Disabled with LABT_TIMING=0 (span() then returns a shared no-op context).
+# -----------------------
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+ENABLED = os.environ.get("LABT_TIMING", "1") != "0"
+RESERVOIR = 256       # last durations kept per stage for percentiles
+MAX_SESSIONS = 200    # per-session aggregates kept (least recently used dropped)
+
+_NOOP = contextlib.nullcontext()
+_current = contextvars.ContextVar("labt_timing_session", default=None)
+
+
+class Timings:
+    """count / total / max and recent-duration percentiles per stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+
+    def add(self, name, seconds):
+        with self._lock:
+            s = self.stages.get(name)
+            if s is None:
+                s = self.stages[name] = {"count": 0, "total": 0.0, "max": 0.0, "recent": deque(maxlen=RESERVOIR)}
+            s["count"] += 1
+            s["total"] += seconds
+            if seconds > s["max"]:
+                s["max"] = seconds
+            s["recent"].append(seconds)
+
+    def to_dict(self):
+        """{stage: {count, total_s, mean_ms, p50_ms, p95_ms, max_ms}}"""
+        with self._lock:
+            snap = {k: (v["count"], v["total"], v["max"], sorted(v["recent"])) for k, v in self.stages.items()}
+        out = {}
+        for name, (count, total, mx, recent) in sorted(snap.items()):
+            def q(p):
+                return recent[min(len(recent) - 1, int(p * len(recent)))] * 1000.0 if recent else 0.0
+            out[name] = {"count": count, "total_s": total, "mean_ms": total / count * 1000.0 if count else 0.0,
+                         "p50_ms": q(0.5), "p95_ms": q(0.95), "max_ms": mx * 1000.0}
+        return out
+
+    def clear(self):
+        with self._lock:
+            self.stages.clear()
+
+
+PROCESS = Timings()
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def bind_session(key):
+    """Attribute the spans of the current thread/context to session `key`."""
+    with _sessions_lock:
+        t = _sessions.get(key)
+        if t is None:
+            t = _sessions[key] = Timings()
+            while len(_sessions) > MAX_SESSIONS:
+                _sessions.popitem(last=False)
+        else:
+            _sessions.move_to_end(key)
+    _current.set(t)
+    return t
+
+
+def sessions():
+    with _sessions_lock:
+        return dict(_sessions)
+
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = time.perf_counter() - self.t0
+        PROCESS.add(self.name, dt)
+        sess = _current.get()
+        if sess is not None:
+            sess.add(self.name, dt)
+        return False
+
+
+def span(name):
+    """with span("sn.decode"): ...  (no-op when timing is disabled)"""
+    if not ENABLED:
+        return _NOOP
+    return _Span(name)
+
+
+def set_enabled(flag):
+    global ENABLED
+    ENABLED = bool(flag)
+
+
+def to_prometheus(prefix="labt"):
+    """Process and per-session aggregates in Prometheus text exposition format."""
+    lines = [f"# HELP {prefix}_stage_seconds Time spent in LabT pipeline stages.",
+             f"# TYPE {prefix}_stage_seconds summary"]
+
+    def esc(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def emit(timings, extra=""):
+        for name, s in timings.to_dict().items():
+            labels = f'stage="{esc(name)}"{extra}'
+            lines.append(f'{prefix}_stage_seconds{{{labels},quantile="0.5"}} {s["p50_ms"] / 1000.0:.6g}')
+            lines.append(f'{prefix}_stage_seconds{{{labels},quantile="0.95"}} {s["p95_ms"] / 1000.0:.6g}')
+            lines.append(f"{prefix}_stage_seconds_sum{{{labels}}} {s['total_s']:.6g}")
+            lines.append(f"{prefix}_stage_seconds_count{{{labels}}} {s['count']}")
+    emit(PROCESS)
+    for key, t in sessions().items():
+        emit(t, f',session="{esc(key)}"')
+    return "\n".join(lines) + "\n"
+
+
+def to_json():
+    return {"enabled": ENABLED, "process": PROCESS.to_dict(),
+            "sessions": {k: t.to_dict() for k, t in sessions().items()}}
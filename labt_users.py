@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+# -----------------------
+# User store: users.json with file locking, atomic replace, mtime-checked cache
+# and scrypt password hashes (plain-text legacy passwords are hashed when the file is loaded).
+# -----------------------
+import base64
+import copy
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+USER_FILE = os.environ.get("LABT_USERS", "users.json")
+
+DEFAULT_USERS = {
+    "admin": {"password": "admin", "role": "admin"},
+    "user": {"password": "user", "role": "user"},
+    "guest": {"password": "guest", "role": "user"}
+}
+
+# scrypt cost: same for every login attempt (~50 ms, 16 MiB)
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+# checked for unknown users and unusable records, so they cost one KDF like a real check
+_DUMMY_HASH = "scrypt$16384$8$1$TACecOfjl3iwVDhvbWfYOg==$q2qtku2CfUuxSGtWXS0FAG3DbJOgIzPdqnwcfZWeabM="
+
+
+def hash_password(password):
+    salt = secrets.token_bytes(16)
+    dk = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=32)
+    return "scrypt${}${}${}${}${}".format(SCRYPT_N, SCRYPT_R, SCRYPT_P,
+                                          base64.b64encode(salt).decode(), base64.b64encode(dk).decode())
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith("scrypt$")
+
+
+def verify_password(password, stored):
+    """Constant-time check against a scrypt hash; anything else never matches."""
+    if not is_hashed(stored):
+        return False
+    _, n, r, p, salt, dk = stored.split("$")
+    got = hashlib.scrypt(password.encode("utf-8"), salt=base64.b64decode(salt),
+                         n=int(n), r=int(r), p=int(p), dklen=len(base64.b64decode(dk)))
+    return hmac.compare_digest(got, base64.b64decode(dk))
+
+
+def _hash_plain(users):
+    """Hash the plain-text passwords of a users dict in place; number changed.
+
+    Missing or empty passwords are left as they are (such accounts cannot log in).
+    """
+    n = 0
+    for rec in users.values():
+        stored = rec.get("password") if isinstance(rec, dict) else None
+        if stored and not is_hashed(stored):
+            rec["password"] = hash_password(str(stored))
+            n += 1
+    return n
+
+
+def user_access_from_record(rec):
+    """Return access list given a user record (compatibility for role or explicit access)."""
+    if not isinstance(rec, dict):
+        return []
+    if rec.get("role") == "admin":
+        return ["admin"]
+    if "access" in rec:
+        return rec.get("access", [])
+    return ["linearity", "sn"]
+
+
+class _FileLock:
+    """Exclusive inter-process lock on <path>.lock (fcntl / msvcrt)."""
+
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        else:
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+        os.close(self.fd)
+        self.fd = None
+
+
+class UserStore:
+    """users.json shared by every session of the process (and other processes).
+
+    Reads come from an in-memory copy refreshed only when the file's mtime/size
+    changes. Every change is a locked read-modify-write of the latest file,
+    written to a temp file and atomically renamed, so concurrent edits are
+    never lost and readers never see a half-written file.
+    """
+
+    def __init__(self, path=USER_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._users = {}
+        self._stamp = None
+        if not os.path.exists(path):
+            # create a safe default to avoid crashes
+            self.update(lambda u: (u.update(copy.deepcopy(DEFAULT_USERS)), _hash_plain(u)))
+
+    def _file_stamp(self):
+        try:
+            st_ = os.stat(self.path)
+            return (st_.st_mtime_ns, st_.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _refresh(self):
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            self._users = self._read()
+            self._stamp = stamp
+            # legacy plain-text entries are hashed once, so every login check runs the KDF
+            if any(isinstance(r, dict) and r.get("password") and not is_hashed(r["password"])
+                   for r in self._users.values()):
+                self.update(_hash_plain)
+
+    def all(self):
+        """Current users {name: record}; treat as read-only, use the setters to change it."""
+        with self._lock:
+            self._refresh()
+            return self._users
+
+    def get(self, name):
+        return self.all().get(name)
+
+    def update(self, change):
+        """Apply change(users_dict) to the latest file content under the file lock."""
+        with self._lock, _FileLock(self.path):
+            users = self._read()
+            result = change(users)
+            fd, tmp = tempfile.mkstemp(prefix=".users.", suffix=".json", dir=os.path.dirname(os.path.abspath(self.path)))
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(users, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            self._users = users
+            self._stamp = self._file_stamp()
+            return result
+
+    def authenticate(self, name, password):
+        """User record if the password matches, else None (same KDF cost either way)."""
+        rec = self.get(name)
+        stored = rec.get("password") if isinstance(rec, dict) else None
+        if not password or not is_hashed(stored):
+            # unknown user, empty password or no usable hash: same KDF cost, no match
+            verify_password(password, _DUMMY_HASH)
+            return None
+        if not verify_password(password, stored):
+            return None
+        return rec
+
+    def set_password(self, name, password):
+        hashed = hash_password(password)
+        self.update(lambda u: u[name].__setitem__("password", hashed) if name in u else None)
+
+    def set_access(self, name, access):
+        self.update(lambda u: u[name].__setitem__("access", list(access)) if name in u else None)
+
+    def add_user(self, name, password, access=None):
+        """False if the name is already taken."""
+        hashed = hash_password(password)
+
+        def change(u):
+            if name in u:
+                return False
+            u[name] = {"password": hashed, "access": list(access or [])}
+            return True
+        return self.update(change)
+
+    def delete_user(self, name):
+        self.update(lambda u: u.pop(name, None))